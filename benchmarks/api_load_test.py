@@ -0,0 +1,64 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "pymakers"))
+
+import bot  # noqa: E402
+import server  # noqa: E402
+from common import name_for  # noqa: E402
+
+CLIENTS = 1000
+REQUESTS_PER_CLIENT = 20
+CONTACTS = 1000
+
+
+def percentile(values: list, fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def client(port: int, number: int, latencies: list) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    for index in range(REQUESTS_PER_CLIENT):
+        if index % 10 == 9:
+            body = f'{{"args": ["{name_for(number)}", "0{number:09d}"]}}'.encode()
+            head = f"POST /commands/add HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode()
+        else:
+            body = b""
+            head = f"GET /commands/phone?arg={name_for((number + index) % CONTACTS)} HTTP/1.1\r\n\r\n".encode()
+        start = time.perf_counter()
+        writer.write(head + body)
+        headers = await reader.readuntil(b"\r\n\r\n")
+        length = int(headers.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+    writer.close()
+
+
+async def main(save: bool, contacts: int) -> None:
+    for number in range(contacts):
+        bot.phonebook.add_record(bot.Record(bot.Name(name_for(number)), phone=bot.Phone(f"0{number:09d}")))
+    api = server.ApiServer(save=save)
+    await api.start("127.0.0.1", 0)
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(client(api.port, number, latencies) for number in range(CLIENTS)))
+    elapsed = time.perf_counter() - start
+    await api.close()
+    latencies.sort()
+    print(f"{CLIENTS} clients, {contacts} contacts, save={save}, {len(latencies)} requests in {elapsed:.2f} s")
+    print(f"{len(latencies) / elapsed:10.0f} requests/s")
+    print(f"p50 {percentile(latencies, 0.5) * 1000:8.2f} ms")
+    print(f"p99 {percentile(latencies, 0.99) * 1000:8.2f} ms")
+
+
+if __name__ == "__main__":
+    # api_load_test.py [contacts] [--no-save]; the books are saved into a
+    # temporary folder.
+    args = [arg for arg in sys.argv[1:] if arg != "--no-save"]
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        asyncio.run(main("--no-save" not in sys.argv, int(args[0]) if args else CONTACTS))
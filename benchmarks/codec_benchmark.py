@@ -0,0 +1,68 @@
+import pickle
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "pymakers"))
+
+import bot  # noqa: E402
+import codec  # noqa: E402
+from common import name_for  # noqa: E402
+
+CONTACTS = 1_000_000
+
+
+def measure(name: str, func) -> float:
+    # Best of three, so one collection or page fault does not decide it.
+    elapsed = min(timed(func) for _ in range(3))
+    print(f"{name:<28} {elapsed:8.3f} s")
+    return elapsed
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def paused(func):
+    def run():
+        with codec.gc_paused():
+            return func()
+
+    return run
+
+
+def main() -> None:
+    contacts = int(sys.argv[1]) if len(sys.argv) > 1 else CONTACTS
+    records = {}
+    for number in range(contacts):
+        record = bot.Record(bot.Name(name_for(number)), phone=f"0{number:09d}")
+        if number % 3 == 0:
+            record.add_email(f"user{number}@example.com")
+        if number % 2 == 0:
+            record.add_birthday("01.02.1990")
+        records[record.get_name()] = record
+    with tempfile.TemporaryDirectory() as tmp:
+        pickled = Path(tmp) / "book.pickle"
+        encoded = Path(tmp) / "book.bin"
+        measure("pickle dump", lambda: pickled.write_bytes(pickle.dumps(records)))
+        measure("codec encode", lambda: encoded.write_bytes(codec.encode(codec.BOOK, list(records.values()))))
+        print(f"{'size':<28} {pickled.stat().st_size / 1e6:8.1f} MB pickle, {encoded.stat().st_size / 1e6:.1f} MB codec")
+        records = None
+        # Decoders only, on bytes already in memory. codec.decode always
+        # pauses the collector, so pickle is timed both ways.
+        pickled_data = pickled.read_bytes()
+        encoded_data = encoded.read_bytes()
+        with_gc = measure("pickle.loads, gc on", lambda: pickle.loads(pickled_data))
+        without_gc = measure("pickle.loads, gc off", paused(lambda: pickle.loads(pickled_data)))
+        new = measure("codec.decode", lambda: codec.decode(encoded_data, bot, codec.BOOK))
+        print(f"{'speedup vs gc on':<28} {with_gc / new:8.1f} x")
+        print(f"{'speedup vs gc off':<28} {without_gc / new:8.1f} x")
+        middle = contacts // 2
+        measure("read 100 from the middle", lambda: codec.read_range(encoded, bot, codec.BOOK, middle, middle + 100))
+
+
+if __name__ == "__main__":
+    main()
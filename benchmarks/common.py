@@ -0,0 +1,3 @@
+def name_for(number: int) -> str:
+    # Names may only contain letters, so the digits are spelled as a-j.
+    return "user" + "".join(chr(ord("a") + int(digit)) for digit in str(number))
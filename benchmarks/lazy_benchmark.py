@@ -0,0 +1,73 @@
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "pymakers"))
+
+import bot  # noqa: E402
+import codec  # noqa: E402
+from common import name_for  # noqa: E402
+from hamt import PersistentDict  # noqa: E402
+
+CONTACTS = 1_000_000
+LOOKUPS = 10_000
+
+
+def rss() -> float:
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * 4096 / 1e6
+
+
+def eager(filename: str) -> PersistentDict:
+    # What load_address_book did before: every record decoded up front.
+    with codec.gc_paused():
+        return PersistentDict(codec.load(filename, bot, codec.BOOK))
+
+
+def lazy(filename: str):
+    book = bot.AddressBook()
+    book.load_address_book(filename)
+    return book.data
+
+
+def run(mode: str, filename: str, contacts: int) -> None:
+    # Runs in a fresh process, so the RSS is that of the load alone.
+    before = rss()
+    start = time.perf_counter()
+    data = eager(filename) if mode == "eager" else lazy(filename)
+    elapsed = time.perf_counter() - start
+    after = rss()
+    names = [name_for(random.randrange(contacts)) for _ in range(LOOKUPS)]
+    start = time.perf_counter()
+    for name in names:
+        data[name].phones
+    lookups = time.perf_counter() - start
+    print(f"{mode:<6} load {elapsed:7.3f} s  rss +{after - before:8.1f} MB  {LOOKUPS} lookups {lookups:.3f} s")
+
+
+def main() -> None:
+    contacts = int(sys.argv[1]) if len(sys.argv) > 1 else CONTACTS
+    records = []
+    for number in range(contacts):
+        record = bot.Record(bot.Name(name_for(number)), phone=f"0{number:09d}")
+        if number % 3 == 0:
+            record.add_email(f"user{number}@example.com")
+        if number % 2 == 0:
+            record.add_birthday("01.02.1990")
+        records.append(record)
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = str(Path(tmp) / "address_book.bin")
+        Path(filename).write_bytes(codec.encode(codec.BOOK, records))
+        records = None
+        context = multiprocessing.get_context("spawn")
+        for mode in ("eager", "lazy"):
+            process = context.Process(target=run, args=(mode, filename, contacts))
+            process.start()
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
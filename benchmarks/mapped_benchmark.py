@@ -0,0 +1,53 @@
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "pymakers"))
+
+import bot  # noqa: E402
+import mapped  # noqa: E402
+from common import name_for  # noqa: E402
+
+CONTACTS = 1_000_000
+LOOKUPS = 10_000
+
+
+def measure(name: str, func):
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:10.6f} s")
+    return result
+
+
+def main() -> None:
+    contacts = int(sys.argv[1]) if len(sys.argv) > 1 else CONTACTS
+    book = bot.AddressBook()
+    for number in range(contacts):
+        record = bot.Record(bot.Name(name_for(number)), phone=f"0{number:09d}")
+        if number % 2 == 0:
+            record.add_birthday("01.02.1990")
+        book.add_record(record)
+    names = [name_for(random.randrange(contacts)) for _ in range(LOOKUPS)]
+    with tempfile.TemporaryDirectory() as tmp:
+        encoded = Path(tmp) / "address_book.bin"
+        snapshot = Path(tmp) / "address_book.map"
+        book.save_address_book(encoded)
+        measure("save_mapped", lambda: book.save_mapped(snapshot))
+        print(f"{'size':<28} {snapshot.stat().st_size / 1e6:10.1f} MB")
+        book = None
+        loaded = bot.AddressBook()
+        measure("load_address_book", lambda: loaded.load_address_book(encoded))
+        measure(f"{LOOKUPS} dict lookups", lambda: [loaded.show_record(name) for name in names])
+        loaded = None
+        view = measure("open mapped", lambda: mapped.MappedBook(snapshot))
+        measure(f"{LOOKUPS} mapped lookups", lambda: [view.show_record(name) for name in names])
+        measure("mapped search", lambda: view.search("0000"))
+        measure("mapped birthdays", lambda: view.birthdays(30))
+        view.close()
+
+
+if __name__ == "__main__":
+    main()
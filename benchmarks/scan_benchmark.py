@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "pymakers"))
+
+import file_parser as parser  # noqa: E402
+
+EXTENSIONS = ["jpg", "txt", "mp3", "mp4", "zip", "bin", ""]
+
+
+def make_files(folder: Path, count: int) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        ext = EXTENSIONS[i % len(EXTENSIONS)]
+        (folder / (f"file_{i}.{ext}" if ext else f"file_{i}")).touch()
+
+
+def make_wide(root: Path, folders: int = 400, files: int = 50) -> None:
+    for i in range(folders):
+        make_files(root / f"folder_{i}", files)
+
+
+def make_deep(root: Path, branches: int = 4, depth: int = 5, files: int = 20) -> None:
+    make_files(root, files)
+    if depth:
+        for i in range(branches):
+            make_deep(root / f"level_{depth}_{i}", branches, depth - 1, files)
+
+
+def measure(name: str, scan, root: Path) -> None:
+    start = time.perf_counter()
+    files = scan(root)
+    elapsed = time.perf_counter() - start
+    found = sum(len(container) for container in files["files"].values()) + len(files["other_files"])
+    print(f"{name:<24} {elapsed:8.3f} s {found / elapsed:12.0f} files/s")
+
+
+def main() -> None:
+    workers = os.cpu_count()
+    for shape, make in (("wide", make_wide), ("deep", make_deep)):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            make(root)
+            print(f"{shape} tree:")
+            measure("scan", lambda folder: parser.scan(folder, sniff=False), root)
+            measure(
+                f"scan_parallel threads={workers}",
+                lambda folder: parser.scan_parallel(folder, workers, sniff=False),
+                root,
+            )
+            measure(
+                f"scan_parallel procs={workers}",
+                lambda folder: parser.scan_parallel(folder, workers, processes=True, sniff=False),
+                root,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "src" / "pymakers"))
+
+import bot  # noqa: E402
+import shards  # noqa: E402
+from common import name_for  # noqa: E402
+
+CONTACTS = 200_000
+
+
+def measure(name: str, func) -> None:
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed:8.3f} s  {len(result)} matches")
+
+
+def main() -> None:
+    records = [bot.Record(bot.Name(name_for(number)), phone=f"0{number:09d}") for number in range(CONTACTS)]
+    for record in records:
+        bot.phonebook.add_record(record)
+    measure("single process search", lambda: bot.search_by_criteria("99", "i").splitlines())
+    with tempfile.TemporaryDirectory() as tmp:
+        with shards.ShardedAddressBook(os.cpu_count(), str(Path(tmp) / "book.bin")) as book:
+            for record in records:
+                book.add_record(record)
+            measure(f"sharded search x{book.count}", lambda: book.search("99", "i"))
+            measure(f"sharded page 1000 x{book.count}", lambda: book.page(1000, 20)[0])
+
+
+if __name__ == "__main__":
+    main()
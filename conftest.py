@@ -1,3 +1,4 @@
 import sys
 
 sys.path.append("src")
+sys.path.append("src/pymakers")
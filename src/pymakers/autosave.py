@@ -0,0 +1,74 @@
+import threading
+import time
+
+
+class AutoSaver:
+    # Calls save() once max_changes changes have piled up or max_delay
+    # seconds after the first unsaved change, whichever comes first, so a
+    # burst of changes becomes a single write. Saving happens on a daemon
+    # thread; changed() only bumps a counter and never waits for the disk.
+    def __init__(self, save, max_changes: int = 100, max_delay: float = 5.0) -> None:
+        self.save = save
+        self.max_changes = max_changes
+        self.max_delay = max_delay
+        self.condition = threading.Condition()
+        self.changes = 0
+        self.first_change = None
+        self.stopping = False
+        self.saves = 0
+        self.thread = threading.Thread(target=self.run, name="autosave", daemon=True)
+
+    def start(self) -> "AutoSaver":
+        self.thread.start()
+        return self
+
+    def changed(self) -> None:
+        with self.condition:
+            self.changes += 1
+            if self.first_change is None:
+                self.first_change = time.monotonic()
+                self.condition.notify()
+            elif self.changes >= self.max_changes:
+                self.condition.notify()
+
+    def run(self) -> None:
+        # Changes are only written off once a save succeeds; a failed save
+        # is tried again max_delay later, even if max_changes have piled up
+        # meanwhile, so a broken disk is not hammered.
+        failed = False
+        while True:
+            with self.condition:
+                while not self.changes and not self.stopping:
+                    self.condition.wait()
+                if not self.changes:
+                    return
+                deadline = self.first_change + self.max_delay
+                while (failed or self.changes < self.max_changes) and not self.stopping:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                saving = self.changes
+            try:
+                self.save()
+            except Exception as error:
+                # The thread must outlive a bad save, or nothing is saved again.
+                print(f"Autosave failed: {error!r}")
+                with self.condition:
+                    if self.stopping:
+                        return
+                    self.first_change = time.monotonic()
+                failed = True
+                continue
+            failed = False
+            with self.condition:
+                self.saves += 1
+                self.changes -= saving
+                self.first_change = time.monotonic() if self.changes else None
+
+    def stop(self) -> None:
+        # Pending changes are saved before the thread ends.
+        with self.condition:
+            self.stopping = True
+            self.condition.notify()
+        self.thread.join()
@@ -1,12 +1,39 @@
 from pathlib import Path
+from autosave import AutoSaver
+from bucket import STRATEGIES
+from client import send_command
+import codec
+from hamt import PersistentDict
+import lazy
+import mapped
+from report import format_progress
+from rules import load_rules
 from sort_dir import sort_dir
-import pickle, re
+from throttle import MB, Throttle
+from view import build_view
+from watch import watch_dir
+import copy, os, pickle, re, sys, threading
 from datetime import datetime
 from collections import UserDict
 from abc import ABC, abstractmethod
 
 cashe = ""
 
+
+def write_atomic(filename, payload):
+    # A crash mid-write leaves the old file in place, never half of a new one.
+    tmp = f"{filename}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as file:
+            file.write(payload)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp, filename)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
 class View(ABC):
     @abstractmethod
     def display_contacts(self, contacts):
@@ -134,10 +161,24 @@ class RecordNote:
 class Notebook(UserDict):
     def __init__(self, record=None):
         super().__init__()
-        self.data = {}
+        self.data = PersistentDict()
         if record is not None:
             self.add_record(record)
 
+    def snapshot(self):
+        # An O(1) frozen copy that later writes do not touch.
+        notebook = Notebook()
+        notebook.data = self.data.copy()
+        return notebook
+
+    def edit_record(self, hashtag):
+        # Records are shared with snapshots, so writers change a copy.
+        record = self.data.get(hashtag)
+        if record is not None:
+            record = copy.deepcopy(record)
+            self.data[hashtag] = record
+        return record
+
     def add_record(self, record):
         self.data[record.get_hashtag()] = record
 
@@ -153,13 +194,11 @@ class Notebook(UserDict):
         return self.data.get(hashtag)
 
     def save_notes(self, filename):
-        with open(filename, "wb") as file:
-            pickle.dump(self.data, file)
+        write_atomic(filename, codec.encode(codec.NOTES, self.data.values()))
 
     def load_notes(self, filename):
         try:
-            with open(filename, "rb") as file:
-                self.data = pickle.load(file)
+            self.data = PersistentDict(codec.load(filename, sys.modules[__name__], codec.NOTES))
         except FileNotFoundError:
             pass
 
@@ -352,10 +391,24 @@ class Record:
 
 class AddressBook(UserDict):
     def __init__(self, record: Record | None = None) -> None:
-        self.data = {}
+        self.data = PersistentDict()
         if record is not None:
             self.add_record(record)
 
+    def snapshot(self):
+        # An O(1) frozen copy that later writes do not touch.
+        book = AddressBook()
+        book.data = self.data.copy()
+        return book
+
+    def edit_record(self, name: str) -> Record:
+        # Records are shared with snapshots, so writers change a copy.
+        record = self.data.get(name)
+        if record is not None:
+            record = copy.deepcopy(record)
+            self.data[name] = record
+        return record
+
     def add_record(self, record: Record):
         self.data[record.get_name()] = record
 
@@ -374,8 +427,16 @@ class AddressBook(UserDict):
             return None
 
     def save_address_book(self, filename):
-        with open(filename, 'wb') as file:
-            pickle.dump(self.data, file)
+        write_atomic(filename, lazy.encode(self.data, codec.BOOK))
+
+    def save_mapped(self, filename):
+        # Read-only copy for other processes, see mapped.MappedBook. Records
+        # of a lazy book are read from their blobs and never decoded.
+        if isinstance(self.data, lazy.LazyDict):
+            fields = (codec.book_fields(blob) for blob in self.data.blobs())
+        else:
+            fields = map(mapped.record_fields, self.data.values())
+        write_atomic(filename, mapped.encode_fields(len(self.data), fields))
 
     def show_record(self, name: str) -> str:    
             result = ''
@@ -394,9 +455,9 @@ class AddressBook(UserDict):
             return result
 
     def load_address_book(self, filename):
+        # Records stay encoded until they are used, see lazy.LazyDict.
         try:
-            with open(filename, 'rb') as file:
-                self.data = pickle.load(file)
+            self.data = lazy.load(filename, sys.modules[__name__], codec.BOOK)
         except FileNotFoundError:
             pass
 
@@ -433,6 +494,21 @@ def input_error(func):
     return inner
 
 
+def writes(func):
+    # Writers take books_lock one at a time; readers work on a snapshot of
+    # the books and never wait for them.
+    def inner(*args, **kwargs):
+        global changes
+        with books_lock:
+            result = func(*args, **kwargs)
+            changes += 1
+        if autosaver is not None:
+            autosaver.changed()
+        return result
+
+    return inner
+
+
 @input_error
 def greeting():
     return "How can I help you?"
@@ -486,6 +562,12 @@ def help():
         "page page_number number_of_contacts_per_page - show all contacts divided into pages, default is the first page with 3 contacts\n"
         "notes page_number number_of_hashtags - show all notes divided into pages, default is the first page with all notes of one hashtag\n"
         "delete name/#hashtag - clears a contact/hashtag by the specified name/hashtag\n"
+        "sort folder incremental/watch/stream - sort files in the folder by category (incremental skips folders unchanged since the last run, watch keeps sorting new files, stream extracts archives straight into categories)\n"
+        "sort folder into target_folder - sort files from the folder into category folders of the target folder, which can be on another disk\n"
+        "sort folder rules rules_file - sort files in the folder using the rules from a JSON file\n"
+        "sort folder view view_folder - build the sorted category folders in view_folder from links, leaving the files in place\n"
+        "sort folder bucket date/exif/hash - sort files into subfolders by month (file date or photo EXIF date) or by name hash\n"
+        "sort folder throttle <MB/s> - sort at no more than the given speed and back off while the disk is busy\n"
         "exit/good bye/close - shutdown/end program"
     )
 
@@ -519,8 +601,9 @@ def find_matching_lines(user_input):
 
 
 @input_error
+@writes
 def add_user(name, contact_details):
-    record = phonebook.get_records(name)
+    record = phonebook.edit_record(name)
     if record:
         return update_user(record, contact_details)
     else:
@@ -549,10 +632,13 @@ def add_note(note):
             if not hashtags:
                 hashtags = [user_input]
 
-    cleaned_note = remove_hashtags_from_note(note)
+    return store_note(remove_hashtags_from_note(note), hashtags)
 
+
+@writes
+def store_note(cleaned_note, hashtags):
     for hashtag in hashtags:
-        record = notebook.get_records(hashtag)
+        record = notebook.edit_record(hashtag)
         if record:
             record.add_note(cleaned_note)
         else:
@@ -592,6 +678,7 @@ def update_user(record, contact_details):
 
 
 @input_error
+@writes
 def del_record(key: str):
     if "#" in key:
         notebook.data.pop(key)
@@ -601,8 +688,9 @@ def del_record(key: str):
 
 
 @input_error
+@writes
 def change_phone(name, new_phone, index=0):
-    record = phonebook.get_records(name)
+    record = phonebook.edit_record(name)
     if record:
         if record.phones and "0" <= str(index) < str(len(record.phones)):
             record.edit_phone(
@@ -615,8 +703,9 @@ def change_phone(name, new_phone, index=0):
         return "There is no such name"
 
 
+@writes
 def change_note(hashtag, index, new_note):
-    record = notebook.get_records(hashtag)
+    record = notebook.edit_record(hashtag)
     if record:
         if record.notes and "0" <= str(index) < str(len(record.notes)):
             record.edit_note(old_note=record.notes[int(index)].value, new_note=new_note)
@@ -629,37 +718,40 @@ def change_note(hashtag, index, new_note):
 
 @input_error
 def show_all():
-    if not phonebook.data:
+    book = phonebook.snapshot()
+    if not book.data:
         return "The phonebook is empty"
     result = ""
-    for name in phonebook.data:
-        result += phonebook.show_record(name) + "\n"
+    for name in book.data:
+        result += book.show_record(name) + "\n"
     return result.rstrip()
 
 
 @input_error
 def find_user_adressbook(name: str, flag=None):
-    if not phonebook.data:
+    book = phonebook.snapshot()
+    if not book.data:
         return "The phonebook is empty"
     result = ""
     if flag is None:
-        return phonebook.show_record(name)
+        return book.show_record(name)
     else:
         name = name.lower()
-        for user in phonebook.data:
+        for user in book.data:
             if name == user.lower():
-                result += phonebook.show_record(user) + "\n"
+                result += book.show_record(user) + "\n"
         return result.rstrip()
 
 
 @input_error
 def show_notes(criteria=None):
-    if not notebook.data:
+    book = notebook.snapshot()
+    if not book.data:
         return "The notebook is empty"
     if not criteria:
-        return str(notebook)
+        return str(book)
 
-    records = notebook.search(criteria)
+    records = book.search(criteria)
     if not records:
         return "No note records found for " + criteria
 
@@ -671,9 +763,10 @@ def show_notes(criteria=None):
 
 @input_error
 def get_note(hashtag):
+    book = notebook.snapshot()
     if hashtag[0] != "#":
         hashtag = "#" + hashtag
-    record = notebook.get_records(hashtag)
+    record = book.get_records(hashtag)
     if record:
         notes = [f"{note}\n----------------------\n" for note in record.notes]
         if notes:
@@ -687,7 +780,8 @@ def get_note(hashtag):
 
 @input_error
 def get_birthday(name):
-    record = phonebook.get_records(name)
+    book = phonebook.snapshot()
+    record = book.get_records(name)
     if record:
         if record.birthday:
             return f"{record.name.value}: {record.birthday.value}, Days to birthday: {record.days_to_birthday()}"
@@ -697,9 +791,10 @@ def get_birthday(name):
         return "There is no such name"
 
 def remaining_days(days=7):
+    book = phonebook.snapshot()
     upcoming_birthdays = []
     result = ""
-    for record in phonebook.data.values():
+    for record in book.data.values():
         name = record.get_name()
         birthday = record.get_birthday()
 
@@ -718,7 +813,8 @@ def remaining_days(days=7):
 
 @input_error
 def get_phone_number(name):
-    record = phonebook.get_records(name)
+    book = phonebook.snapshot()
+    record = book.get_records(name)
     if record:
         if record.phones:
             phones = [f"{record.get_name()}: {phone}" for phone in record.phones]
@@ -732,7 +828,8 @@ def get_phone_number(name):
 
 @input_error
 def get_email(name):
-    record = phonebook.get_records(name)
+    book = phonebook.snapshot()
+    record = book.get_records(name)
     if record:
         if record.emails:
             emails = [f"{record.get_name()}: {email}" for email in record.emails]
@@ -748,16 +845,17 @@ def get_email(name):
 
 @input_error
 def search_by_criteria(criteria: str, flag=None):
+    book = phonebook.snapshot()
     if criteria:
         result = []
         result_str = ""
-        for user in phonebook.data:
-            record_str = phonebook.show_record(user)
+        for user in book.data:
+            record_str = book.show_record(user)
             if flag is not None:
                 criteria = criteria.lower()
                 record_str = record_str.lower()
             if record_str.find(criteria) >= 0:
-                result.append(phonebook.show_record(user))
+                result.append(book.show_record(user))
         for el in result:
             result_str += el + "\n"
         if result == []:
@@ -767,7 +865,8 @@ def search_by_criteria(criteria: str, flag=None):
 
 @input_error
 def iteration_note(page=1, count_hashtag=1):
-    if not notebook.data:
+    book = notebook.snapshot()
+    if not book.data:
         return "The notebook is empty"
 
     page = int(page)
@@ -775,7 +874,7 @@ def iteration_note(page=1, count_hashtag=1):
     start_index = (page - 1) * count_hashtag
     end_index = start_index + count_hashtag
 
-    records = list(notebook)
+    records = list(book)
     total_pages = (len(records) + count_hashtag - 1) // count_hashtag
 
     if page < 1 or page > total_pages:
@@ -797,7 +896,8 @@ def iteration_note(page=1, count_hashtag=1):
 
 @input_error
 def iteration(page=1, page_size=3):
-    if not phonebook.data:
+    book = phonebook.snapshot()
+    if not book.data:
         return "The phonebook is empty"
 
     page = int(page)
@@ -805,7 +905,7 @@ def iteration(page=1, page_size=3):
     start_index = (page - 1) * page_size
     end_index = start_index + page_size
 
-    records = list(phonebook)
+    records = list(book)
     total_pages = (len(records) + page_size - 1) // page_size
 
     if page < 1 or page > total_pages:
@@ -820,8 +920,58 @@ def iteration(page=1, page_size=3):
     return result.rstrip()
 
 
-def sorting_directory(folder):
-    return sort_dir(Path(folder).resolve())
+def show_progress(event):
+    print("\r" + format_progress(event), end="", flush=True)
+
+
+SORT_MODES = (None, "incremental", "watch", "stream")
+SORT_TARGET_MODES = {
+    "into": "target_folder",
+    "rules": "rules_file",
+    "view": "view_folder",
+    "bucket": "/".join(STRATEGIES),
+    "throttle": "<MB/s>",
+}
+
+
+def sorting_directory(folder, mode=None, target=None):
+    # Bad mode words are answered with a message instead of an exception,
+    # so a typo does not end the session.
+    if not Path(folder).is_dir():
+        return f"There is no folder {folder}"
+    if mode not in SORT_MODES and mode not in SORT_TARGET_MODES:
+        modes = ", ".join(mode for mode in SORT_MODES + tuple(SORT_TARGET_MODES) if mode)
+        return f"Unknown sort mode: {mode}. Use one of: {modes}"
+    if mode in SORT_TARGET_MODES and target is None:
+        return f"Use: sort folder {mode} {SORT_TARGET_MODES[mode]}"
+    if mode == "watch":
+        print("Watching the folder, press Ctrl+C to stop")
+        return watch_dir(Path(folder).resolve())
+    if mode == "view":
+        return str(build_view(Path(folder), Path(target)))
+    options = {"incremental": mode == "incremental", "stream_archives": mode == "stream"}
+    if mode == "into":
+        options["target"] = Path(target).resolve()
+    elif mode == "rules":
+        try:
+            options["rules"] = load_rules(Path(target))
+        except (OSError, ValueError, TypeError) as error:
+            return f"Can not use the rules file {target}: {error}"
+    elif mode == "bucket":
+        if target not in STRATEGIES:
+            return f"Unknown bucket strategy: {target}. Use one of: {', '.join(STRATEGIES)}"
+        options["bucket"] = target
+    elif mode == "throttle":
+        try:
+            speed = float(target)
+        except ValueError:
+            speed = 0
+        if not speed > 0:
+            return f"The speed must be a positive number of MB/s, not {target}"
+        options["throttle"] = Throttle(speed * MB, low_priority=True)
+    report = sort_dir(Path(folder).resolve(), progress=show_progress, **options)
+    print()
+    return str(report)
 
 
 commands = {
@@ -851,8 +1001,12 @@ commands = {
 
 filename1 = "address_book.bin"
 filename2 = "note_book.bin"
+filename3 = "address_book.map"
 phonebook = AddressBook()
 notebook = Notebook()
+books_lock = threading.Lock()
+autosaver = None
+changes = 0
 console_view = ConsoleView()
 
 
@@ -883,11 +1037,77 @@ def command_parser(user_input):
     return handler, args
 
 
+def save_books():
+    # Saves snapshots, so it can run on the autosave thread while the
+    # handlers keep changing the books.
+    book = phonebook.snapshot()
+    book.save_address_book(filename1)
+    book.save_mapped(filename3)
+    notebook.snapshot().save_notes(filename2)
+
+
+def migrate_file(filename, kind: int) -> bool:
+    # Rewrites a pickled file from before the codec format. Unpickling can
+    # run code from the file, so this only happens when asked for with
+    # `pymakers migrate`, never on a normal load. Returns False for files
+    # that are already converted.
+    with open(filename, "rb") as file:
+        data = file.read()
+    if data[:4] == codec.MAGIC:
+        return False
+    records = pickle.loads(data)
+    write_atomic(filename, codec.encode(kind, list(records.values())))
+    return True
+
+
+def migrate_books():
+    for filename, kind in ((filename1, codec.BOOK), (filename2, codec.NOTES)):
+        try:
+            if migrate_file(filename, kind):
+                print(f"Converted {filename}")
+        except FileNotFoundError:
+            pass
+
+
+def run_once(words):
+    phonebook.load_address_book(filename1)
+    notebook.load_notes(filename2)
+    # Read-only commands leave the files alone.
+    handler, args = command_parser(" ".join(words))
+    before = changes
+    result = handler(*args)
+    if changes != before:
+        save_books()
+    return result
+
+
 def main():
+    # pymakers daemon           - keep the books loaded behind a Unix socket
+    # pymakers migrate          - convert pickled books from older versions
+    # pymakers <command ...>    - run one command, through the daemon if it is up
+    # pymakers                  - interactive mode
+    words = sys.argv[1:]
+    if words == ["daemon"]:
+        import asyncio
+        from server import serve_unix
+        asyncio.run(serve_unix())
+        return
+    if words == ["migrate"]:
+        migrate_books()
+        return
+    if words:
+        result = send_command(words)
+        if result is None:
+            result = run_once(words)
+        if result:
+            print(result)
+        return
     phonebook.load_address_book(filename1)
     notebook.load_notes(filename2)
     phonebook.display_contacts(console_view)
     notebook.display_notes(console_view)
+    global autosaver
+    autosaver = AutoSaver(save_books).start()
 
     while True:
         user_input = input(">>> ")
@@ -900,8 +1120,8 @@ def main():
 
         if not result:
             print("Goodbye!")
-            phonebook.save_address_book(filename1)
-            notebook.save_notes(filename2)
+            # stop() saves what is still unsaved.
+            autosaver.stop()
             break
         print(result)
 
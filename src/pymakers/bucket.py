@@ -0,0 +1,159 @@
+import hashlib
+import os
+from datetime import datetime
+from pathlib import Path
+
+STRATEGIES = ("date", "exif", "hash")
+EXIF_EXTENSIONS = (".jpg", ".jpeg")
+EXIF_IFD_POINTER = 0x8769
+DATETIME_ORIGINAL = 0x9003
+DATETIME = 0x0132
+
+
+def tiff_date(tiff: bytes) -> datetime | None:
+    if tiff[:2] == b"II":
+        order = "little"
+    elif tiff[:2] == b"MM":
+        order = "big"
+    else:
+        return None
+
+    def number(offset: int, size: int) -> int:
+        if offset + size > len(tiff):
+            raise ValueError("EXIF data is truncated")
+        return int.from_bytes(tiff[offset:offset + size], order)
+
+    def find_tag(ifd: int, tag: int) -> int | None:
+        for index in range(number(ifd, 2)):
+            entry = ifd + 2 + index * 12
+            if number(entry, 2) == tag:
+                return number(entry + 8, 4)
+        return None
+
+    try:
+        ifd0 = number(4, 4)
+        exif_ifd = find_tag(ifd0, EXIF_IFD_POINTER)
+        offset = find_tag(exif_ifd, DATETIME_ORIGINAL) if exif_ifd is not None else None
+        if offset is None:
+            offset = find_tag(ifd0, DATETIME)
+        if offset is None:
+            return None
+        return datetime.strptime(tiff[offset:offset + 19].decode("ascii"), "%Y:%m:%d %H:%M:%S")
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+def read_exif_date(filename: Path) -> datetime | None:
+    # Walks the JPEG marker segments up to the APP1 "Exif" block; only
+    # the header is read, never the image data.
+    with open(filename, "rb") as file:
+        if file.read(2) != b"\xff\xd8":
+            return None
+        while True:
+            marker = file.read(4)
+            if len(marker) < 4 or marker[0] != 0xFF or marker[1] in (0xD9, 0xDA):
+                return None
+            length = int.from_bytes(marker[2:], "big") - 2
+            if marker[1] != 0xE1:
+                file.seek(length, os.SEEK_CUR)
+                continue
+            data = file.read(length)
+            if data.startswith(b"Exif\x00\x00"):
+                return tiff_date(data[6:])
+
+
+class Bucketer:
+    def __init__(self, strategy: str | None = None, max_entries: int | None = None) -> None:
+        if strategy is not None and strategy not in STRATEGIES:
+            raise ValueError(f"Unknown bucket strategy: {strategy}")
+        if max_entries is not None and max_entries < 3:
+            # One file and two subfolders is the smallest split that does
+            # not turn into a chain of nested folders.
+            raise ValueError("max_entries must be at least 3")
+        self.strategy = strategy
+        self.max_entries = max_entries
+        self.counts = {}
+        self.numbers = {}
+        self.cursors = {}
+        self.depths = {}
+
+    def bucket_for(self, filename: Path) -> str | None:
+        if self.strategy == "hash":
+            return hashlib.sha1(filename.name.encode("utf-8", "surrogateescape")).hexdigest()[:2]
+        if self.strategy is None:
+            return None
+        date = None
+        if self.strategy == "exif" and filename.suffix.lower() in EXIF_EXTENSIONS:
+            try:
+                date = read_exif_date(filename)
+            except OSError:
+                date = None
+        if date is None:
+            date = datetime.fromtimestamp(filename.stat().st_mtime)
+        return f"{date.year:04d}/{date.month:02d}"
+
+    def count(self, folder: Path) -> int:
+        count = self.counts.get(folder)
+        if count is None:
+            try:
+                with os.scandir(folder) as entries:
+                    count = sum(1 for _ in entries)
+            except FileNotFoundError:
+                count = 0
+            self.counts[folder] = count
+        return count
+
+    def next_subfolder(self, folder: Path) -> Path | None:
+        # The next numbered subfolder (0002, 0003...), or None when folder
+        # has no slot left for it. One already on disk was counted by the
+        # scandir; a new one takes a slot.
+        number = self.numbers.get(folder, 1) + 1
+        subfolder = folder / f"{number:04d}"
+        if not subfolder.is_dir():
+            if self.count(folder) >= self.max_entries:
+                return None
+            self.counts[folder] = self.count(folder) + 1
+        self.numbers[folder] = number
+        return subfolder
+
+    def place(self, folder: Path, depth: int) -> Path | None:
+        # About half of a folder's entries take files, the rest (at least
+        # two) numbered subfolders that are filled the same way, at most depth levels
+        # down. Returns None when those levels are full. The cursor keeps
+        # the subfolder being filled, so a file costs one step per level.
+        files = self.max_entries - max(2, self.max_entries // 2)
+        if self.count(folder) < files:
+            self.counts[folder] = self.count(folder) + 1
+            return folder
+        if not depth:
+            return None
+        cursor_depth, number = self.cursors.get(folder, (depth, 2))
+        if cursor_depth != depth:
+            number = 2
+        while True:
+            if number > self.numbers.get(folder, 1) and self.next_subfolder(folder) is None:
+                self.cursors[folder] = (depth, number)
+                return None
+            found = self.place(folder / f"{number:04d}", depth - 1)
+            if found is not None:
+                self.cursors[folder] = (depth, number)
+                return found
+            number += 1
+
+    def folder_for(self, filename: Path, target_folder: Path) -> Path:
+        bucket = self.bucket_for(filename)
+        folder = target_folder / bucket if bucket else target_folder
+        if self.max_entries is None:
+            return folder
+        # A full folder spills over into numbered subfolders, one more level
+        # only once every level above is full, so no folder holds more than
+        # max_entries entries and the depth grows with the log of the file
+        # count. The overflow stays inside the category folder the scan
+        # skips.
+        depth = self.depths.get(folder, 0)
+        found = self.place(folder, depth)
+        while found is None:
+            depth += 1
+            found = self.place(folder, depth)
+        self.depths[folder] = depth
+        return found
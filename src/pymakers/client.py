@@ -0,0 +1,24 @@
+import json
+import socket
+
+SOCKET_NAME = ".pymakers.sock"
+
+
+def send_command(words: list, path: str = SOCKET_NAME, timeout: float = 30.0) -> str | None:
+    # Returns None when no daemon is listening or the daemon does not serve
+    # the command, so the caller can fall back to loading the books itself.
+    if not hasattr(socket, "AF_UNIX"):
+        return None
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(path)
+            sock.sendall(json.dumps(words).encode() + b"\n")
+            with sock.makefile("rb") as file:
+                line = file.readline()
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    reply = json.loads(line)
+    if reply.get("status") == 404:
+        return None
+    return reply.get("result") or reply.get("error") or ""
@@ -0,0 +1,335 @@
+import gc
+import struct
+from contextlib import contextmanager
+from datetime import date
+
+# File layout, all integers are unsigned LEB128 varints unless noted:
+#   header:  MAGIC, version byte, kind byte, schema (string), record count
+#   records: length, then the fields of the schema in order
+#   index:   block size, entry count, then one 8-byte little-endian offset
+#            per block of records
+#   footer:  8-byte little-endian index offset, MAGIC
+# Strings are a byte length followed by UTF-8, lists a count followed by the
+# items, dates their proleptic ordinal (0 for none). The record length lets a
+# reader skip fields it does not know and jump over records it does not need.
+MAGIC = b"PMKB"
+VERSION = 1
+BOOK = 1
+NOTES = 2
+SCHEMAS = {
+    BOOK: "name:str,phones:[str],emails:[str],birthday:date",
+    NOTES: "hashtag:str,notes:[str]",
+}
+BLOCK = 1024
+OFFSET = struct.Struct("<Q")
+FOOTER = struct.Struct("<Q4s")
+CHUNK = 1024 * 1024
+
+
+class CodecError(ValueError):
+    pass
+
+
+def write_varint(out: bytearray, value: int) -> None:
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def write_str(out: bytearray, text: str) -> None:
+    data = text.encode("utf-8")
+    write_varint(out, len(data))
+    out += data
+
+
+def read_varint(data, pos: int) -> tuple:
+    result = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+
+def encode_record(kind: int, record) -> bytearray:
+    out = bytearray()
+    if kind == BOOK:
+        write_str(out, record.name.value)
+        write_varint(out, len(record.phones))
+        for phone in record.phones:
+            write_str(out, phone.value)
+        write_varint(out, len(record.emails))
+        for email in record.emails:
+            write_str(out, email.value)
+        write_varint(out, record.birthday.value.toordinal() if record.birthday else 0)
+    else:
+        write_str(out, record.hashtag.value)
+        write_varint(out, len(record.notes))
+        for note in record.notes:
+            write_str(out, note.value)
+    return out
+
+
+def record_blob(kind: int, record) -> bytes:
+    # One record as stored in the file, length prefix included.
+    payload = encode_record(kind, record)
+    out = bytearray()
+    write_varint(out, len(payload))
+    return bytes(out + payload)
+
+
+def book_fields(blob: bytes, separator: bytes = b", ") -> tuple:
+    # (name, phones, emails, birthday ordinal) of an address book blob, as
+    # UTF-8 bytes with the lists joined by separator, without building the
+    # record. Fields a newer writer appended are skipped.
+    _, pos = read_varint(blob, 0)
+    size, pos = read_varint(blob, pos)
+    name = blob[pos:pos + size]
+    pos += size
+    lists = []
+    for _ in range(2):
+        count, pos = read_varint(blob, pos)
+        items = []
+        for _ in range(count):
+            size, pos = read_varint(blob, pos)
+            items.append(blob[pos:pos + size])
+            pos += size
+        lists.append(separator.join(items))
+    ordinal, _ = read_varint(blob, pos)
+    return name, lists[0], lists[1], ordinal
+
+
+def encode_blobs(kind: int, count: int, blobs, schema: str | None = None) -> bytes:
+    # Writes count records given as record_blob results, so records that
+    # are still encoded are copied over as they are. A schema that extends
+    # the kind's one describes fields the blobs carry after the known ones.
+    out = bytearray(MAGIC)
+    out.append(VERSION)
+    out.append(kind)
+    write_str(out, schema or SCHEMAS[kind])
+    write_varint(out, count)
+    offsets = []
+    for index, blob in enumerate(blobs):
+        if index % BLOCK == 0:
+            offsets.append(len(out))
+        out += blob
+    index_offset = len(out)
+    write_varint(out, BLOCK)
+    write_varint(out, len(offsets))
+    for offset in offsets:
+        out += OFFSET.pack(offset)
+    out += FOOTER.pack(index_offset, MAGIC)
+    return bytes(out)
+
+
+def encode(kind: int, records: list) -> bytes:
+    return encode_blobs(kind, len(records), (record_blob(kind, record) for record in records))
+
+
+def read_schema(data) -> str:
+    # The schema as written, which may extend the kind's one.
+    length, pos = read_varint(data, 6)
+    return bytes(data[pos:pos + length]).decode("utf-8")
+
+
+def read_header(data) -> tuple:
+    # Returns (kind, record count, offset of the first record).
+    if bytes(data[:4]) != MAGIC:
+        raise CodecError("Not a pymakers file; files from older versions are converted by `pymakers migrate`")
+    if data[4] != VERSION:
+        raise CodecError(f"Unsupported file version {data[4]}")
+    kind = data[5]
+    length, pos = read_varint(data, 6)
+    schema = bytes(data[pos:pos + length]).decode("utf-8")
+    # Newer writers may only append fields; the known ones must come first.
+    if kind not in SCHEMAS or not schema.startswith(SCHEMAS[kind]):
+        raise CodecError(f"Unknown schema: {schema}")
+    count, pos = read_varint(data, pos + length)
+    return kind, count, pos
+
+
+def new_field(cls, value):
+    # Values were validated when they were stored, so the setters are skipped.
+    field = cls.__new__(cls)
+    field._value = value
+    return field
+
+
+@contextmanager
+def gc_paused():
+    # Decoding only allocates and nothing it builds is garbage yet, but every
+    # few hundred objects the cyclic collector would walk all of them again;
+    # on a million records that is most of the time spent.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def decode_records(data, pos: int, count: int, kind: int, types) -> tuple:
+    # Decodes count records starting at pos into (key, record) pairs; types
+    # is the namespace with the record and field classes (the bot module).
+    # Returns the pairs and the position after the last record. The loops
+    # are inlined by hand: lengths below 128 take a single byte, and that
+    # is nearly every string, so they skip the read_varint call.
+    new = object.__new__
+    items = []
+    append = items.append
+    if kind == BOOK:
+        Record, Name, Phone, Email, Birthday = types.Record, types.Name, types.Phone, types.Email, types.Birthday
+        fromordinal = date.fromordinal
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            end = pos + length
+            size = data[pos]
+            if size < 0x80:
+                pos += 1
+            else:
+                size, pos = read_varint(data, pos)
+            name = str(data[pos:pos + size], "utf-8")
+            pos += size
+            phones = []
+            number = data[pos]
+            if number < 0x80:
+                pos += 1
+            else:
+                number, pos = read_varint(data, pos)
+            for _ in range(number):
+                size = data[pos]
+                if size < 0x80:
+                    pos += 1
+                else:
+                    size, pos = read_varint(data, pos)
+                field = new(Phone)
+                field._value = str(data[pos:pos + size], "utf-8")
+                phones.append(field)
+                pos += size
+            emails = []
+            number = data[pos]
+            if number < 0x80:
+                pos += 1
+            else:
+                number, pos = read_varint(data, pos)
+            for _ in range(number):
+                size = data[pos]
+                if size < 0x80:
+                    pos += 1
+                else:
+                    size, pos = read_varint(data, pos)
+                field = new(Email)
+                field._value = str(data[pos:pos + size], "utf-8")
+                emails.append(field)
+                pos += size
+            record = new(Record)
+            field = record.name = new(Name)
+            field._value = name
+            record.phones = phones
+            record.emails = emails
+            if data[pos]:
+                ordinal = read_varint(data, pos)[0]
+                field = record.birthday = new(Birthday)
+                field._value = fromordinal(ordinal)
+            else:
+                record.birthday = None
+            append((name, record))
+            pos = end
+    else:
+        RecordNote, Hashtag, Note = types.RecordNote, types.Hashtag, types.Note
+        for _ in range(count):
+            length, pos = read_varint(data, pos)
+            end = pos + length
+            size, pos = read_varint(data, pos)
+            hashtag = str(data[pos:pos + size], "utf-8")
+            pos += size
+            notes = []
+            number, pos = read_varint(data, pos)
+            for _ in range(number):
+                size, pos = read_varint(data, pos)
+                notes.append(new_field(Note, str(data[pos:pos + size], "utf-8")))
+                pos += size
+            record = new(RecordNote)
+            record.hashtag = new_field(Hashtag, hashtag)
+            record.notes = notes
+            append((hashtag, record))
+            pos = end
+    return items, pos
+
+
+def decode(data, types, kind: int) -> list:
+    found, count, pos = read_header(data)
+    if found != kind:
+        raise CodecError("The file holds a different kind of records")
+    with gc_paused():
+        return decode_records(data, pos, count, kind, types)[0]
+
+
+def load(filename, types, kind: int):
+    # Returns (key, record) pairs. Files written before this format are
+    # pickled dicts and raise CodecError; see bot.migrate_file.
+    with open(filename, "rb") as file:
+        data = file.read()
+    return decode(data, types, kind)
+
+
+def iter_file(file, types, kind: int):
+    # Streaming decoder: reads the file in chunks and yields (key, record)
+    # pairs, holding at most one chunk plus one record in memory.
+    buffer = bytearray(file.read(CHUNK))
+    found, count, pos = read_header(buffer)
+    if found != kind:
+        raise CodecError("The file holds a different kind of records")
+    for _ in range(count):
+        while True:
+            try:
+                length, start = read_varint(buffer, pos)
+                if start + length <= len(buffer):
+                    break
+            except IndexError:
+                pass
+            chunk = file.read(CHUNK)
+            if not chunk:
+                raise CodecError("The file is truncated")
+            del buffer[:pos]
+            pos = 0
+            buffer += chunk
+        items, pos = decode_records(buffer, pos, 1, kind, types)
+        yield items[0]
+
+
+def read_range(filename, types, kind: int, start: int, stop: int) -> list:
+    # Decodes only records start..stop-1: the index gives the block holding
+    # start, the record lengths skip to it inside the block.
+    with open(filename, "rb") as file:
+        head = file.read(CHUNK)
+        found, count, _ = read_header(head)
+        if found != kind:
+            raise CodecError("The file holds a different kind of records")
+        stop = min(stop, count)
+        if start >= stop:
+            return []
+        file.seek(-FOOTER.size, 2)
+        index_offset, magic = FOOTER.unpack(file.read(FOOTER.size))
+        if magic != MAGIC:
+            raise CodecError("The file is truncated")
+        file.seek(index_offset)
+        index = file.read()
+        size, pos = read_varint(index, 0)
+        entries, pos = read_varint(index, pos)
+        block = start // size
+        last = (stop - 1) // size + 1
+        offset = OFFSET.unpack_from(index, pos + block * OFFSET.size)[0]
+        end = OFFSET.unpack_from(index, pos + last * OFFSET.size)[0] if last < entries else index_offset
+        file.seek(offset)
+        data = file.read(end - offset)
+    pos = 0
+    for _ in range(start - block * size):
+        length, pos = read_varint(data, pos)
+        pos += length
+    return decode_records(data, pos, stop - start, kind, types)[0]
@@ -0,0 +1,119 @@
+import os
+from pathlib import Path
+import shutil
+
+# Windows has no dir_fd support at all; there every call falls back to
+# plain paths.
+HAS_DIR_FD = {os.open, os.mkdir, os.rename, os.rmdir, os.unlink} <= os.supports_dir_fd and os.scandir in os.supports_fd
+DIR_FLAGS = os.O_RDONLY | getattr(os, "O_DIRECTORY", 0)
+FILE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0)
+MAX_OPEN = 256
+
+
+def open_dir(name, dir_fd: int | None = None) -> int:
+    return os.open(name, DIR_FLAGS, dir_fd=dir_fd)
+
+
+class DirCache:
+    # Open descriptors of the folders a run touches. Renames, mkdir and rmdir
+    # go through them, so the kernel resolves one name instead of the whole
+    # path, and a folder renamed during the run is still the one written to.
+    # At most max_open descriptors stay open, least recently used go first.
+    def __init__(self, max_open: int = MAX_OPEN) -> None:
+        self.fds = {}
+        self.max_open = max_open
+
+    def fd(self, folder: Path, create: bool = False, created: list | None = None) -> int | None:
+        # Folders made on the way are added to created, parents first.
+        if not HAS_DIR_FD:
+            if create:
+                make_path(folder, created)
+            return None
+        fd = self.fds.pop(folder, None)
+        if fd is None:
+            fd = self.open(folder, create, created)
+            while len(self.fds) >= self.max_open:
+                os.close(self.fds.pop(next(iter(self.fds))))
+        self.fds[folder] = fd
+        return fd
+
+    def open(self, folder: Path, create: bool, created: list | None = None) -> int:
+        parent = self.fds.get(folder.parent)
+        try:
+            if parent is None:
+                return open_dir(folder)
+            return open_dir(folder.name, parent)
+        except FileNotFoundError:
+            if not create or folder.parent == folder:
+                raise
+        parent = self.fd(folder.parent, True, created)
+        try:
+            os.mkdir(folder.name, dir_fd=parent)
+            if created is not None:
+                created.append(folder)
+        except FileExistsError:
+            pass
+        return open_dir(folder.name, parent)
+
+    def make(self, folder: Path, created: list | None = None) -> None:
+        self.fd(folder, True, created)
+
+    def device(self, folder: Path) -> int:
+        if not HAS_DIR_FD:
+            return os.stat(folder).st_dev
+        return os.fstat(self.fd(folder)).st_dev
+
+    def rename(self, source: Path, target: Path) -> None:
+        if not HAS_DIR_FD:
+            os.replace(source, target)
+            return
+        source_fd = self.fd(source.parent)
+        os.rename(source.name, target.name, src_dir_fd=source_fd, dst_dir_fd=self.fd(target.parent))
+
+    def create(self, target: Path) -> int:
+        # A descriptor of target opened for writing, truncated if it exists.
+        if not HAS_DIR_FD:
+            return os.open(target, FILE_FLAGS, 0o666)
+        return os.open(target.name, FILE_FLAGS, 0o666, dir_fd=self.fd(target.parent))
+
+    def unlink(self, target: Path) -> None:
+        if not HAS_DIR_FD:
+            os.unlink(target)
+            return
+        os.unlink(target.name, dir_fd=self.fd(target.parent))
+
+    def rmdir(self, folder: Path) -> None:
+        fd = self.fds.pop(folder, None)
+        if fd is not None:
+            os.close(fd)
+        if not HAS_DIR_FD:
+            os.rmdir(folder)
+            return
+        os.rmdir(folder.name, dir_fd=self.fd(folder.parent))
+
+    def rmtree(self, folder: Path) -> None:
+        # Descriptors under folder are closed first, so a folder made again
+        # at the same path is not taken for the removed one.
+        for cached in [cached for cached in self.fds if cached == folder or folder in cached.parents]:
+            os.close(self.fds.pop(cached))
+        shutil.rmtree(folder)
+
+    def close(self) -> None:
+        for fd in self.fds.values():
+            os.close(fd)
+        self.fds.clear()
+
+
+def make_path(folder: Path, created: list | None = None) -> None:
+    # mkdir(parents=True), adding the folders it made to created.
+    missing = []
+    while not folder.exists():
+        missing.append(folder)
+        folder = folder.parent
+    for folder in reversed(missing):
+        try:
+            folder.mkdir()
+        except FileExistsError:
+            continue
+        if created is not None:
+            created.append(folder)
@@ -1,55 +1,211 @@
+import os
 import sys
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from functools import partial
 from pathlib import Path
+from dirs import HAS_DIR_FD, open_dir
+from journal import JOURNAL_NAME
+from manifest import MANIFEST_NAME, cached_subfolders, is_processed, is_unchanged
+from rules import CATEGORIES, DEFAULT_RULES, SKIPPED_FOLDERS, RuleSet, get_extension
+from sniff import sniff_files
 
-CATEGORIES = {
-    'images': ['jpeg', 'jpg', 'png', 'svg'],
-    'audio': ['mp3', 'ogg', 'wav', 'amr'],
-    'video': ['avi', 'mp4', 'mov', 'mkv'],
-    'documents': ['doc', 'docx', 'txt', 'pdf', 'xlsx', 'pptx'],
-    'archives': ['zip', 'gz', 'tar']
-}
-
-
-def get_extension(filename: str) -> str:
-    return Path(filename).suffix[1:].lower()
-
-
-def scan_folder(folder: Path, files: dict) -> None:
-    for item in folder.iterdir():
-        if item.is_dir():
-            if item.name not in ('archives', 'video', 'audio', 'documents', 'images', 'other'):
-                files["folders"].append(item)
-                scan_folder(item, files)
-            continue
-        ext = get_extension(item.name)
-        full_name = folder / item.name
-        if not ext:
-            files['other_files'].append(full_name)
+IGNORED_FILES = (MANIFEST_NAME, MANIFEST_NAME + ".tmp", JOURNAL_NAME)
+
+
+def get_category(filename: str, rules: RuleSet = DEFAULT_RULES) -> str | None:
+    return rules.classify_name(filename)
+
+
+def classify_entry(
+    item: os.DirEntry, manifest: dict | None = None, rules: RuleSet = DEFAULT_RULES, folder: Path | None = None
+) -> str | None:
+    if item.is_dir():
+        return None if item.name in rules.skip_folders else "folder"
+    if item.name in IGNORED_FILES:
+        return None
+    if manifest is not None and is_processed(manifest, item, folder):
+        return None
+    return rules.classify(item)
+
+
+def scan_iter(
+    folder: Path,
+    manifest: dict | None = None,
+    tree: dict | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+    dir_fd: int | None = None,
+):
+    # Yields ("folder", path) before a folder's contents and (category, path)
+    # for files, "other" when the extension is not known. Only the open
+    # scandir iterators along the current path are kept in memory, and where
+    # the platform allows it each folder is opened relative to its parent's
+    # descriptor instead of by its full path. tree gets (stat, subfolders)
+    # for every folder, the stat taken before the folder is listed.
+    subfolders = []
+    fd = None
+    if HAS_DIR_FD:
+        fd = open_dir(folder if dir_fd is None else folder.name, dir_fd)
+    try:
+        stat = os.stat(fd if fd is not None else folder) if manifest is not None or tree is not None else None
+        if tree is not None:
+            tree[folder] = (stat, subfolders)
+        if manifest is not None and is_unchanged(manifest, folder, stat):
+            for name in cached_subfolders(manifest, folder):
+                subfolders.append(name)
+                yield "folder", folder / name
+                yield from scan_iter(folder / name, manifest, tree, rules, fd)
+            return
+        with os.scandir(fd if fd is not None else folder) as entries:
+            for item in entries:
+                category = classify_entry(item, manifest, rules, folder)
+                if category == "folder":
+                    subfolders.append(item.name)
+                    yield "folder", folder / item.name
+                    yield from scan_iter(folder / item.name, manifest, tree, rules, fd)
+                elif category is not None:
+                    yield category, folder / item.name
+    finally:
+        if fd is not None:
+            os.close(fd)
+
+
+def scan_level(folder: Path, manifest: dict | None = None, rules: RuleSet = DEFAULT_RULES) -> tuple:
+    stat = folder.stat()
+    if manifest is not None and is_unchanged(manifest, folder, stat):
+        return folder, stat, list(cached_subfolders(manifest, folder)), []
+    subfolders = []
+    found = []
+    with os.scandir(folder) as entries:
+        for item in entries:
+            category = classify_entry(item, manifest, rules)
+            if category == "folder":
+                subfolders.append(item.name)
+            elif category is not None:
+                found.append((category, item.name))
+    return folder, stat, subfolders, found
+
+
+def scan_iter_parallel(
+    folder: Path,
+    workers: int | None = None,
+    manifest: dict | None = None,
+    tree: dict | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+):
+    # Same entries as scan_iter, but every folder is a separate task on a
+    # shared pool, so idle threads pick up whatever subtree is left no
+    # matter how wide or deep the tree is. A folder is yielded when it is
+    # queued, which still puts every parent before its children.
+    workers = workers or min(32, (os.cpu_count() or 1) + 4)
+    waiting = deque([folder])
+    running = set()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while waiting or running:
+            while waiting and len(running) < workers * 2:
+                running.add(pool.submit(scan_level, waiting.popleft(), manifest, rules))
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                parent, stat, subfolders, found = future.result()
+                if tree is not None:
+                    tree[parent] = (stat, subfolders)
+                for name in subfolders:
+                    waiting.append(parent / name)
+                    yield "folder", parent / name
+                for category, name in found:
+                    yield category, parent / name
+
+
+def add_entry(files: dict, category: str, full_name: Path) -> None:
+    if category == "folder":
+        files["folders"].append(full_name)
+        return
+    ext = get_extension(full_name.name)
+    if category == "other":
+        if ext:
+            files['unknown_extensions'].add(ext)
+        files['other_files'].append(full_name)
+    else:
+        if ext:
+            files['extensions'].add(ext)
+        files['files'].setdefault(category, []).append(full_name)
+
+
+def scan_folder(folder: Path, files: dict, manifest: dict | None = None, rules: RuleSet = DEFAULT_RULES) -> None:
+    for category, full_name in scan_iter(folder, manifest, files["tree"], rules):
+        add_entry(files, category, full_name)
+
+
+def merge_files(files: dict, other: dict) -> None:
+    for category, container in other["files"].items():
+        files["files"].setdefault(category, []).extend(container)
+    for key in ("extensions", "unknown_extensions"):
+        files[key].update(other[key])
+    for key in ("folders", "other_files"):
+        files[key].extend(other[key])
+    files["tree"].update(other["tree"])
+    files["sniffed"].update(other["sniffed"])
+
+
+def sniff_other_files(files: dict, rules: RuleSet = DEFAULT_RULES) -> None:
+    other_files = []
+    for full_name, ext in zip(files['other_files'], sniff_files(files['other_files'])):
+        category = rules.by_extension(ext)
+        if category == "other":
+            other_files.append(full_name)
         else:
-            if ext in files['files_by_extension']:
-                container = files['files_by_extension'][ext]
-                files['extensions'].add(ext)
-                container.append(full_name)
-            else:
-                files['unknown_extensions'].add(ext)
-                files['other_files'].append(full_name)
-
-
-def scan(folder: Path):
-    files_by_category = dict((category, []) for category in CATEGORIES)
-    files_by_extension = {}
-    for category, extensions in CATEGORIES.items():
-        for extension in extensions:
-            files_by_extension[extension] = files_by_category[category]
+            files['files'].setdefault(category, []).append(full_name)
+            files['sniffed'][full_name] = ext
+    files['other_files'] = other_files
+
+
+def new_files(rules: RuleSet = DEFAULT_RULES) -> dict:
     files = {
-        "files": files_by_category,
-        "files_by_extension": files_by_extension,
+        "files": dict((category, []) for category in rules.targets),
         "extensions": set(),
         "folders": [],
+        "tree": {},
         "unknown_extensions": set(),
         "other_files": [],
+        "sniffed": {},
     }
-    scan_folder(folder, files)
+    return files
+
+
+def scan(folder: Path, manifest: dict | None = None, sniff: bool = True, rules: RuleSet = DEFAULT_RULES):
+    files = new_files(rules)
+    scan_folder(folder, files, manifest, rules)
+    if sniff:
+        sniff_other_files(files, rules)
+    return files
+
+
+def scan_parallel(
+    folder: Path,
+    workers: int | None = None,
+    processes: bool = False,
+    manifest: dict | None = None,
+    sniff: bool = True,
+    rules: RuleSet = DEFAULT_RULES,
+):
+    files = new_files(rules)
+    if not processes:
+        for category, full_name in scan_iter_parallel(folder, workers, manifest, files["tree"], rules):
+            add_entry(files, category, full_name)
+    else:
+        # Processes get whole top-level subtrees: per-folder tasks would
+        # spend more time pickling results than scanning.
+        _, stat, subfolders, found = scan_level(folder, manifest, rules)
+        files["tree"][folder] = (stat, subfolders)
+        for category, name in found:
+            add_entry(files, category, folder / name)
+        scan_subtree = partial(scan, manifest=manifest, sniff=False, rules=rules)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for name, subtree in zip(subfolders, pool.map(scan_subtree, [folder / name for name in subfolders])):
+                files["folders"].append(folder / name)
+                merge_files(files, subtree)
+    if sniff:
+        sniff_other_files(files, rules)
     return files
 
 
@@ -0,0 +1,252 @@
+from collections.abc import Mapping, MutableMapping
+from operator import attrgetter
+
+BITS = 5
+MASK = (1 << BITS) - 1
+HASH_BITS = 64
+HASH_MASK = (1 << HASH_BITS) - 1
+
+
+class Leaf:
+    __slots__ = ("key", "hash", "value", "order")
+
+    def __init__(self, key, hash: int, value, order: int) -> None:
+        self.key = key
+        self.hash = hash
+        self.value = value
+        self.order = order
+
+
+class Bitmap:
+    # One trie level: bit i of the bitmap is set when slot i is used, and
+    # items holds only the used slots, each a Leaf or a deeper node.
+    __slots__ = ("bitmap", "items")
+
+    def __init__(self, bitmap: int, items: tuple) -> None:
+        self.bitmap = bitmap
+        self.items = items
+
+
+class Collision:
+    # Leaves whose 64 hash bits are all equal.
+    __slots__ = ("hash", "items")
+
+    def __init__(self, hash: int, items: tuple) -> None:
+        self.hash = hash
+        self.items = items
+
+
+EMPTY = Bitmap(0, ())
+by_order = attrgetter("order")
+
+
+def key_hash(key) -> int:
+    return hash(key) & HASH_MASK
+
+
+def slot(bitmap: int, bit: int) -> int:
+    return (bitmap & (bit - 1)).bit_count()
+
+
+def node_get(node, key, hash: int):
+    shift = 0
+    while True:
+        if isinstance(node, Collision):
+            for leaf in node.items:
+                if leaf.key == key:
+                    return leaf
+            return None
+        bit = 1 << ((hash >> shift) & MASK)
+        if not node.bitmap & bit:
+            return None
+        entry = node.items[slot(node.bitmap, bit)]
+        if isinstance(entry, Leaf):
+            return entry if entry.hash == hash and entry.key == key else None
+        node = entry
+        shift += BITS
+
+
+def merge(first: Leaf, second: Leaf, shift: int):
+    if shift >= HASH_BITS:
+        return Collision(first.hash, (first, second))
+    first_index = (first.hash >> shift) & MASK
+    second_index = (second.hash >> shift) & MASK
+    if first_index == second_index:
+        return Bitmap(1 << first_index, (merge(first, second, shift + BITS),))
+    items = (first, second) if first_index < second_index else (second, first)
+    return Bitmap((1 << first_index) | (1 << second_index), items)
+
+
+def node_set(node, leaf: Leaf, shift: int):
+    # Returns the new node; only the nodes along the path are copied.
+    if isinstance(node, Collision):
+        items = tuple(item for item in node.items if item.key != leaf.key)
+        return Collision(node.hash, items + (leaf,))
+    bit = 1 << ((leaf.hash >> shift) & MASK)
+    index = slot(node.bitmap, bit)
+    if not node.bitmap & bit:
+        return Bitmap(node.bitmap | bit, node.items[:index] + (leaf,) + node.items[index:])
+    entry = node.items[index]
+    if isinstance(entry, Leaf):
+        if entry.hash == leaf.hash and entry.key == leaf.key:
+            new = leaf
+        else:
+            new = merge(entry, leaf, shift + BITS)
+    else:
+        new = node_set(entry, leaf, shift + BITS)
+    return Bitmap(node.bitmap, node.items[:index] + (new,) + node.items[index + 1:])
+
+
+def node_delete(node, key, hash: int, shift: int):
+    # Returns the new node, a Leaf when only one is left below a root level,
+    # or None when the node is now empty.
+    if isinstance(node, Collision):
+        items = tuple(item for item in node.items if item.key != key)
+        return items[0] if len(items) == 1 else Collision(node.hash, items)
+    bit = 1 << ((hash >> shift) & MASK)
+    index = slot(node.bitmap, bit)
+    entry = node.items[index]
+    new = None if isinstance(entry, Leaf) else node_delete(entry, key, hash, shift + BITS)
+    if new is not None and shift and len(node.items) == 1 and isinstance(new, Leaf):
+        return new
+    if new is not None:
+        return Bitmap(node.bitmap, node.items[:index] + (new,) + node.items[index + 1:])
+    bitmap = node.bitmap ^ bit
+    if not bitmap:
+        return None
+    items = node.items[:index] + node.items[index + 1:]
+    if shift and len(items) == 1 and isinstance(items[0], Leaf):
+        return items[0]
+    return Bitmap(bitmap, items)
+
+
+def build(leaves: list, shift: int):
+    if shift >= HASH_BITS:
+        return Collision(leaves[0].hash, tuple(leaves))
+    buckets = {}
+    for leaf in leaves:
+        buckets.setdefault((leaf.hash >> shift) & MASK, []).append(leaf)
+    bitmap = 0
+    items = []
+    for index in sorted(buckets):
+        bitmap |= 1 << index
+        bucket = buckets[index]
+        items.append(bucket[0] if len(bucket) == 1 else build(bucket, shift + BITS))
+    return Bitmap(bitmap, tuple(items))
+
+
+def iter_leaves(node):
+    for entry in node.items:
+        if isinstance(entry, Leaf):
+            yield entry
+        else:
+            yield from iter_leaves(entry)
+
+
+class HamtMap(Mapping):
+    # Immutable hash array mapped trie. set() and delete() return a new map
+    # that shares every untouched node with the old one, so keeping an old
+    # version costs nothing until it is changed, and it is freed as soon as
+    # nobody holds it any more. Iteration follows insertion order like dict.
+    __slots__ = ("root", "size", "next_order", "ordered")
+
+    def __init__(self, root: Bitmap = EMPTY, size: int = 0, next_order: int = 0) -> None:
+        self.root = root
+        self.size = size
+        self.next_order = next_order
+        self.ordered = None
+
+    @classmethod
+    def from_items(cls, items) -> "HamtMap":
+        leaves = {}
+        for key, value in items:
+            leaves[key] = Leaf(key, key_hash(key), value, len(leaves))
+        if not leaves:
+            return cls()
+        return cls(build(list(leaves.values()), 0), len(leaves), len(leaves))
+
+    def leaves(self) -> list:
+        if self.ordered is None:
+            self.ordered = sorted(iter_leaves(self.root), key=by_order)
+        return self.ordered
+
+    def __getitem__(self, key):
+        leaf = node_get(self.root, key, key_hash(key))
+        if leaf is None:
+            raise KeyError(key)
+        return leaf.value
+
+    def __contains__(self, key) -> bool:
+        return node_get(self.root, key, key_hash(key)) is not None
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self):
+        return (leaf.key for leaf in self.leaves())
+
+    def items(self):
+        return [(leaf.key, leaf.value) for leaf in self.leaves()]
+
+    def values(self):
+        return [leaf.value for leaf in self.leaves()]
+
+    def set(self, key, value) -> "HamtMap":
+        hash = key_hash(key)
+        old = node_get(self.root, key, hash)
+        if old is not None:
+            leaf = Leaf(key, hash, value, old.order)
+            return HamtMap(node_set(self.root, leaf, 0), self.size, self.next_order)
+        leaf = Leaf(key, hash, value, self.next_order)
+        return HamtMap(node_set(self.root, leaf, 0), self.size + 1, self.next_order + 1)
+
+    def delete(self, key) -> "HamtMap":
+        hash = key_hash(key)
+        if node_get(self.root, key, hash) is None:
+            raise KeyError(key)
+        root = node_delete(self.root, key, hash, 0)
+        return HamtMap(root if root is not None else EMPTY, self.size - 1, self.next_order)
+
+
+class PersistentDict(MutableMapping):
+    # The mutable face of a HamtMap: every change swaps in a new version, and
+    # snapshot() hands out the current one in O(1). Iterating this object
+    # also walks one fixed version, so writers never break a running loop.
+    def __init__(self, items=()) -> None:
+        if isinstance(items, HamtMap):
+            self.map = items
+        else:
+            self.map = HamtMap.from_items(items.items() if isinstance(items, Mapping) else items)
+
+    def snapshot(self) -> HamtMap:
+        return self.map
+
+    def copy(self) -> "PersistentDict":
+        return PersistentDict(self.map)
+
+    def __getitem__(self, key):
+        return self.map[key]
+
+    def __contains__(self, key) -> bool:
+        return key in self.map
+
+    def __setitem__(self, key, value) -> None:
+        self.map = self.map.set(key, value)
+
+    def __delitem__(self, key) -> None:
+        self.map = self.map.delete(key)
+
+    def __len__(self) -> int:
+        return len(self.map)
+
+    def __iter__(self):
+        return iter(self.map)
+
+    def items(self):
+        return self.map.items()
+
+    def values(self):
+        return self.map.values()
+
+    def __repr__(self) -> str:
+        return f"PersistentDict({dict(self.map.items())!r})"
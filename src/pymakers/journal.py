@@ -0,0 +1,89 @@
+import json
+import os
+from pathlib import Path
+
+JOURNAL_NAME = ".pymakers_journal"
+
+
+class Journal:
+    def __init__(self, filename: Path, batch_size: int = 256) -> None:
+        self.filename = filename
+        self.batch_size = batch_size
+        self.unsynced = 0
+        # Line buffered: each record reaches the kernel at once, so a killed
+        # process loses nothing; fsync only guards against power loss.
+        self.file = open(filename, "a", encoding="utf-8", buffering=1)
+
+    def write(self, op: str, state: str, source: Path, target: Path, sync: bool = False) -> None:
+        self.file.write(json.dumps([op, state, str(source), str(target)]) + "\n")
+        self.unsynced += 1
+        if sync or self.unsynced >= self.batch_size:
+            self.sync()
+
+    def begin(self, op: str, source: Path, target: Path, sync: bool = False) -> None:
+        self.write(op, "begin", source, target, sync)
+
+    def done(self, op: str, source: Path, target: Path) -> None:
+        self.write(op, "done", source, target)
+
+    def sync(self) -> None:
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self, remove: bool = True) -> None:
+        self.sync()
+        self.file.close()
+        if remove:
+            self.filename.unlink()
+
+
+def read_journal(filename: Path) -> list:
+    entries = []
+    with open(filename, encoding="utf-8") as file:
+        for line in file:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+    return entries
+
+
+def finish_move(source: Path, target: Path) -> None:
+    target.with_name(f".{target.name}.part").unlink(missing_ok=True)
+    if source.exists() and target.exists() and source.stat().st_size == target.stat().st_size:
+        source.unlink()
+
+
+def recover(filename: Path) -> int:
+    # Renames are atomic, so only interrupted copies and extractions need
+    # fixing: a finished copy or extraction still has its source deleted,
+    # an unfinished stream extraction has its written members removed and
+    # an unfinished unpack is simply redone over the same folder. Renames
+    # are not journaled; a "done" move without a "begin", from an older
+    # journal, is left alone: a file that has since appeared at its old
+    # source path is a new one.
+    if not filename.exists():
+        return 0
+    pending = {}
+    written = {}
+    begun = set()
+    for op, state, source, target in read_journal(filename):
+        if op == "write":
+            written.setdefault(source, []).append(target)
+        elif state == "begin":
+            pending[(op, source, target)] = False
+            begun.add((op, source, target))
+        else:
+            pending[(op, source, target)] = True
+    for (op, source, target), done in pending.items():
+        if op == "move":
+            if (op, source, target) in begun:
+                finish_move(Path(source), Path(target))
+        elif op == "extract" and done:
+            Path(source).unlink(missing_ok=True)
+        elif op == "extract":
+            for member in written.get(source, []):
+                Path(member).unlink(missing_ok=True)
+    filename.unlink()
+    return len(pending)
@@ -0,0 +1,191 @@
+import threading
+import zlib
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+import codec
+from hamt import HamtMap
+
+CACHE_SIZE = 4096
+DELETED = object()
+
+
+class BlobStore:
+    # The records of one codec file, kept as the file's bytes. Only an
+    # offset per record and an open-addressing table of crc32(key) slots
+    # (entry number + 1, 0 is empty) are built on load; a record becomes
+    # objects when it is asked for, and the last CACHE_SIZE of those are
+    # kept. The store never changes, so every copy of a book shares it.
+    def __init__(self, data: bytes, types, kind: int, cache_size: int = CACHE_SIZE) -> None:
+        found, count, pos = codec.read_header(data)
+        if found != kind:
+            raise codec.CodecError("The file holds a different kind of records")
+        self.data = data
+        self.types = types
+        self.kind = kind
+        self.offsets = array("Q", bytes(8 * count))
+        size = 1
+        while size < count * 2:
+            size *= 2
+        self.mask = size - 1
+        self.slots = array("I", bytes(4 * size))
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        read_varint = codec.read_varint
+        crc32 = zlib.crc32
+        offsets, slots, mask = self.offsets, self.slots, self.mask
+        for number in range(count):
+            offsets[number] = pos
+            length, start = read_varint(data, pos)
+            size, name = read_varint(data, start)
+            index = crc32(data[name:name + size]) & mask
+            while slots[index]:
+                index = (index + 1) & mask
+            slots[index] = number + 1
+            pos = start + length
+        self.end = pos
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def key_bytes(self, number: int) -> bytes:
+        start = codec.read_varint(self.data, self.offsets[number])[1]
+        size, start = codec.read_varint(self.data, start)
+        return self.data[start:start + size]
+
+    def key(self, number: int) -> str:
+        return str(self.key_bytes(number), "utf-8")
+
+    def find(self, key: str) -> int:
+        # Returns the entry number of key, or -1.
+        key = key.encode("utf-8")
+        index = zlib.crc32(key) & self.mask
+        while True:
+            number = self.slots[index]
+            if not number:
+                return -1
+            if self.key_bytes(number - 1) == key:
+                return number - 1
+            index = (index + 1) & self.mask
+
+    def record(self, number: int):
+        with self.lock:
+            record = self.cache.get(number)
+            if record is not None:
+                self.cache.move_to_end(number)
+                return record
+        items, _ = codec.decode_records(self.data, self.offsets[number], 1, self.kind, self.types)
+        record = items[0][1]
+        with self.lock:
+            record = self.cache.setdefault(number, record)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return record
+
+    def blob(self, number: int) -> bytes:
+        end = self.offsets[number + 1] if number + 1 < len(self.offsets) else self.end
+        return self.data[self.offsets[number]:end]
+
+
+class LazyDict(MutableMapping):
+    # A book mapping over a BlobStore. Writes never touch the store: they go
+    # to two HamtMaps, changed (store keys set in place, or DELETED) and
+    # added (new keys, and store keys added again after a delete, which
+    # dict order puts at the end). The maps and the delete count are
+    # swapped as one tuple, so copy() and iteration see one consistent
+    # version, in O(1), like PersistentDict.snapshot().
+    def __init__(self, store: BlobStore, state: tuple = (HamtMap(), HamtMap(), 0)) -> None:
+        self.store = store
+        self.state = state
+
+    def copy(self) -> "LazyDict":
+        return LazyDict(self.store, self.state)
+
+    def __getitem__(self, key):
+        changed, added, _ = self.state
+        if key in added:
+            return added[key]
+        value = changed.get(key)
+        if value is None:
+            number = self.store.find(key)
+            value = self.store.record(number) if number >= 0 else DELETED
+        if value is DELETED:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key) -> bool:
+        changed, added, _ = self.state
+        if key in added:
+            return True
+        value = changed.get(key)
+        if value is not None:
+            return value is not DELETED
+        return self.store.find(key) >= 0
+
+    def __setitem__(self, key, value) -> None:
+        changed, added, deleted = self.state
+        if key in added:
+            added = added.set(key, value)
+        elif changed.get(key) is not DELETED and self.store.find(key) >= 0:
+            changed = changed.set(key, value)
+        else:
+            added = added.set(key, value)
+        self.state = (changed, added, deleted)
+
+    def __delitem__(self, key) -> None:
+        changed, added, deleted = self.state
+        if key in added:
+            added = added.delete(key)
+        elif changed.get(key) is not DELETED and self.store.find(key) >= 0:
+            changed = changed.set(key, DELETED)
+            deleted += 1
+        else:
+            raise KeyError(key)
+        self.state = (changed, added, deleted)
+
+    def __len__(self) -> int:
+        changed, added, deleted = self.state
+        return len(self.store) - deleted + len(added)
+
+    def iter_items(self, state: tuple):
+        # (key, value or None for an untouched store record, entry number).
+        changed, added, _ = state
+        for number in range(len(self.store)):
+            key = self.store.key(number)
+            value = changed.get(key) if len(changed) else None
+            if value is not DELETED:
+                yield key, value, number
+        for key, value in added.items():
+            yield key, value, -1
+
+    def __iter__(self):
+        return (key for key, _, _ in self.iter_items(self.state))
+
+    def items(self):
+        return ((key, value if value is not None else self.store.record(number))
+                for key, value, number in self.iter_items(self.state))
+
+    def values(self):
+        return (value for _, value in self.items())
+
+    def blobs(self):
+        # Untouched records are copied from the store without decoding.
+        kind = self.store.kind
+        for _, value, number in self.iter_items(self.state):
+            yield self.store.blob(number) if value is None else codec.record_blob(kind, value)
+
+    def __repr__(self) -> str:
+        return f"LazyDict({len(self)} records)"
+
+
+def load(filename, types, kind: int):
+    with open(filename, "rb") as file:
+        data = file.read()
+    return LazyDict(BlobStore(data, types, kind))
+
+
+def encode(data, kind: int) -> bytes:
+    if isinstance(data, LazyDict) and data.store.kind == kind:
+        return codec.encode_blobs(kind, len(data), data.blobs())
+    return codec.encode(kind, data.values())
@@ -0,0 +1,86 @@
+import json
+import os
+from pathlib import Path
+
+MANIFEST_NAME = ".pymakers_manifest"
+MANIFEST_VERSION = 2
+
+
+def new_manifest() -> dict:
+    return {"version": MANIFEST_VERSION, "folders": {}, "files": {}}
+
+
+def load_manifest(filename: Path) -> dict:
+    # JSON, not pickle: the manifest lives in the folder being sorted, where
+    # anybody may drop a file. Anything unexpected just means a full scan.
+    try:
+        with open(filename, "rb") as file:
+            manifest = json.load(file)
+        if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+            return new_manifest()
+        folders = {
+            folder: (mtime, inode, tuple(children))
+            for folder, (mtime, inode, children) in manifest["folders"].items()
+        }
+        files = {target: tuple(entry) for target, entry in manifest["files"].items()}
+    except FileNotFoundError:
+        return new_manifest()
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return new_manifest()
+    return {"version": MANIFEST_VERSION, "folders": folders, "files": files}
+
+
+def save_manifest(filename: Path, manifest: dict) -> None:
+    tmp_name = filename.with_name(filename.name + ".tmp")
+    with open(tmp_name, "w", encoding="utf-8") as file:
+        json.dump(manifest, file)
+    os.replace(tmp_name, filename)
+
+
+def is_unchanged(manifest: dict, folder: Path, stat: os.stat_result) -> bool:
+    entry = manifest["folders"].get(str(folder))
+    return entry is not None and entry[:2] == (stat.st_mtime_ns, stat.st_ino)
+
+
+def cached_subfolders(manifest: dict, folder: Path) -> tuple:
+    return manifest["folders"][str(folder)][2]
+
+
+def is_processed(manifest: dict, entry: os.DirEntry, folder: Path | None = None) -> bool:
+    # Entries of a scandir over a descriptor only know their own name.
+    known = manifest["files"].get(entry.path if folder is None else os.path.join(folder, entry.name))
+    if known is None or known[3] != entry.inode():
+        return False
+    stat = entry.stat(follow_symlinks=False)
+    return known[1:3] == (stat.st_size, stat.st_mtime_ns)
+
+
+def remember_file(entries: dict, filename: Path, target: Path) -> None:
+    stat = target.stat()
+    entries[str(target)] = (str(filename), stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+def update_manifest(manifest: dict, tree: dict, entries: dict) -> None:
+    # tree maps each scanned folder to (stat, subfolders), the stat taken
+    # before the folder was listed: a file created in it later in the run
+    # changes its mtime, so the next run lists the folder again instead of
+    # missing the file for good.
+    folders = {}
+    for folder, (stat, subfolders) in tree.items():
+        if not os.path.isdir(folder):
+            continue
+        children = tuple(name for name in subfolders if os.path.isdir(folder / name))
+        folders[str(folder)] = (stat.st_mtime_ns, stat.st_ino, children)
+    manifest["folders"] = folders
+    manifest["files"].update(entries)
+    # Files that were moved away, deleted or replaced since are dropped, so
+    # the list does not only ever grow.
+    files = {}
+    for target, known in manifest["files"].items():
+        try:
+            stat = os.lstat(target)
+        except OSError:
+            continue
+        if stat.st_ino == known[3]:
+            files[target] = known
+    manifest["files"] = files
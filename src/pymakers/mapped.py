@@ -0,0 +1,200 @@
+import mmap
+import struct
+import zlib
+from datetime import date
+
+# Read-only address book laid out to be used straight from mmap:
+#   header:  MAGIC, version, record count, slot count
+#   entries: one fixed-width ENTRY per record, in book order
+#   slots:   open-addressing hash table of entry number + 1 (0 is empty),
+#            keyed by crc32 of the name, probed linearly
+#   heap:    per record the UTF-8 name, then the phones and then the emails,
+#            each list joined by ", " as show_record prints it
+# An entry holds the heap offset, the three byte lengths and the birthday
+# ordinal (0 for none). Opening reads only the header, so it is O(1); every
+# lookup reads a few slots and one entry, and the pages come from the page
+# cache that all processes mapping the file share.
+MAGIC = b"PMKM"
+VERSION = 1
+HEADER = struct.Struct("<4sB3xQQ")
+ENTRY = struct.Struct("<QIIII")
+SLOT = struct.Struct("<I")
+SEPARATOR = ", "
+
+
+class MappedError(ValueError):
+    pass
+
+
+def slot_count(count: int) -> int:
+    # A power of two at least twice the records keeps the probes short.
+    size = 1
+    while size < count * 2:
+        size *= 2
+    return size
+
+
+def record_fields(record) -> tuple:
+    # (name, phones, emails, birthday ordinal), the texts as UTF-8 bytes.
+    name = record.name.value.encode("utf-8")
+    phones = SEPARATOR.join(phone.value for phone in record.phones).encode("utf-8")
+    emails = SEPARATOR.join(email.value for email in record.emails).encode("utf-8")
+    return name, phones, emails, record.birthday.value.toordinal() if record.birthday else 0
+
+
+def encode_fields(count: int, fields) -> bytes:
+    # Takes count record_fields tuples one at a time, so a caller can feed
+    # them from a stream without holding every record.
+    slots = slot_count(count)
+    table = bytearray(slots * SLOT.size)
+    entries = bytearray()
+    heap = bytearray()
+    for number, (name, phones, emails, ordinal) in enumerate(fields):
+        entries += ENTRY.pack(len(heap), len(name), len(phones), len(emails), ordinal)
+        heap += name + phones + emails
+        index = zlib.crc32(name) & (slots - 1)
+        while SLOT.unpack_from(table, index * SLOT.size)[0]:
+            index = (index + 1) & (slots - 1)
+        SLOT.pack_into(table, index * SLOT.size, number + 1)
+    return HEADER.pack(MAGIC, VERSION, count, slots) + bytes(entries) + bytes(table) + bytes(heap)
+
+
+def encode(records) -> bytes:
+    records = list(records)
+    return encode_fields(len(records), map(record_fields, records))
+
+
+def days_to_birthday(birthday: date) -> int:
+    # Same count as Record.days_to_birthday.
+    today = date.today()
+    next_birthday = date(today.year, birthday.month, birthday.day)
+    if today > next_birthday:
+        next_birthday = date(today.year + 1, birthday.month, birthday.day)
+    return (next_birthday - today).days
+
+
+class MappedBook:
+    # Answers the read commands of the address book from a file written by
+    # encode. The writer replaces the file with os.replace, so a process
+    # keeps reading the version it mapped until it opens the file again.
+    def __init__(self, filename) -> None:
+        with open(filename, "rb") as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, version, self.count, self.slots = HEADER.unpack_from(self.map)
+        except struct.error:
+            self.map.close()
+            raise MappedError("Not a mapped address book")
+        if magic != MAGIC or version != VERSION:
+            self.map.close()
+            raise MappedError("Not a mapped address book")
+        self.entries = HEADER.size
+        self.table = self.entries + self.count * ENTRY.size
+        self.heap = self.table + self.slots * SLOT.size
+
+    def close(self) -> None:
+        self.map.close()
+
+    def __enter__(self) -> "MappedBook":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def entry(self, number: int) -> tuple:
+        return ENTRY.unpack_from(self.map, self.entries + number * ENTRY.size)
+
+    def text(self, offset: int, size: int) -> str:
+        start = self.heap + offset
+        return str(self.map[start:start + size], "utf-8")
+
+    def find(self, name: str) -> int:
+        # Returns the entry number of name, or -1.
+        key = name.encode("utf-8")
+        index = zlib.crc32(key) & (self.slots - 1)
+        while True:
+            number = SLOT.unpack_from(self.map, self.table + index * SLOT.size)[0]
+            if not number:
+                return -1
+            offset, size = self.entry(number - 1)[:2]
+            start = self.heap + offset
+            if size == len(key) and self.map[start:start + size] == key:
+                return number - 1
+            index = (index + 1) & (self.slots - 1)
+
+    def __contains__(self, name: str) -> bool:
+        return self.find(name) >= 0
+
+    def __iter__(self):
+        for number in range(self.count):
+            offset, size = self.entry(number)[:2]
+            yield self.text(offset, size)
+
+    def fields(self, number: int) -> tuple:
+        # (name, phones, emails, birthday) of one entry; the lists stay joined.
+        offset, name_size, phones_size, emails_size, ordinal = self.entry(number)
+        name = self.text(offset, name_size)
+        phones = self.text(offset + name_size, phones_size)
+        emails = self.text(offset + name_size + phones_size, emails_size)
+        return name, phones, emails, date.fromordinal(ordinal) if ordinal else None
+
+    def phones(self, name: str) -> list | None:
+        number = self.find(name)
+        if number < 0:
+            return None
+        phones = self.fields(number)[1]
+        return phones.split(SEPARATOR) if phones else []
+
+    def emails(self, name: str) -> list | None:
+        number = self.find(name)
+        if number < 0:
+            return None
+        emails = self.fields(number)[2]
+        return emails.split(SEPARATOR) if emails else []
+
+    def birthday(self, name: str) -> date | None:
+        number = self.find(name)
+        return self.fields(number)[3] if number >= 0 else None
+
+    def line(self, number: int) -> str:
+        # The line AddressBook.show_record prints for this entry.
+        name, phones, emails, birthday = self.fields(number)
+        result = f"{name}:"
+        if phones:
+            result += f" phones: {phones}"
+        if emails:
+            result += f" emails: {emails}"
+        if birthday:
+            result += f" birthday: {birthday} days to birthday: {days_to_birthday(birthday)}"
+        return result
+
+    def show_record(self, name: str) -> str | None:
+        number = self.find(name)
+        return self.line(number) if number >= 0 else None
+
+    def search(self, criteria: str, flag=None) -> list:
+        if flag is not None:
+            criteria = criteria.lower()
+        found = []
+        for number in range(self.count):
+            line = self.line(number)
+            if (line.lower() if flag is not None else line).find(criteria) >= 0:
+                found.append(line)
+        return found
+
+    def birthdays(self, days: int = 7) -> list:
+        # Only the fixed-width ordinals are read until a birthday matches.
+        found = []
+        days = int(days)
+        for number in range(self.count):
+            offset, size, _, _, ordinal = self.entry(number)
+            if ordinal:
+                birthday = date.fromordinal(ordinal)
+                days_left = days_to_birthday(birthday)
+                if days_left <= days:
+                    found.append(f"{self.text(offset, size)}: birthday: {birthday} days to birthday: {days_left}")
+        return found
+
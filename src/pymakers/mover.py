@@ -0,0 +1,223 @@
+import errno
+import filecmp
+import os
+import shutil
+import time
+from contextlib import nullcontext
+from pathlib import Path
+from dirs import DirCache
+from journal import Journal
+from throttle import Throttle
+
+COPY_CHUNK = 8 * 1024 * 1024
+THROTTLED_CHUNK = 1024 * 1024
+FALLBACK_ERRORS = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF, errno.ENOTSOCK)
+
+
+class MoveStats:
+    def __init__(self) -> None:
+        self.renamed = 0
+        self.copied = 0
+        self.duplicates = 0
+        self.bytes_copied = 0
+        self.copy_seconds = 0.0
+
+    @property
+    def mb_per_second(self) -> float:
+        if not self.copy_seconds:
+            return 0.0
+        return self.bytes_copied / self.copy_seconds / 1024 / 1024
+
+    def __str__(self) -> str:
+        result = f"{self.renamed} files renamed, {self.copied} files copied"
+        if self.copied:
+            result += f" ({self.bytes_copied / 1024 / 1024:.1f} MB at {self.mb_per_second:.1f} MB/s)"
+        return result
+
+
+def throttled(throttle: Throttle | None, size: int = 0, ops: int = 0):
+    # Checked on every operation: set_limits() may turn limits on or off
+    # while a run is going.
+    if throttle is None or not throttle.limited:
+        return nullcontext()
+    return throttle.io(size, ops)
+
+
+def chunk_size(throttle: Throttle | None) -> int:
+    return THROTTLED_CHUNK if throttle is not None else COPY_CHUNK
+
+
+def copy_range(source_fd: int, target_fd: int, size: int, throttle: Throttle | None = None) -> None:
+    copied = 0
+    while copied < size:
+        count = min(chunk_size(throttle), size - copied)
+        with throttled(throttle, count):
+            sent = os.copy_file_range(source_fd, target_fd, count)
+        if not sent:
+            break
+        copied += sent
+
+
+def copy_sendfile(source_fd: int, target_fd: int, size: int, throttle: Throttle | None = None) -> None:
+    copied = 0
+    while copied < size:
+        count = min(chunk_size(throttle), size - copied)
+        with throttled(throttle, count):
+            sent = os.sendfile(target_fd, source_fd, copied, count)
+        if not sent:
+            break
+        copied += sent
+
+
+def copy_stream(source, target, throttle: Throttle | None = None) -> None:
+    if throttle is None:
+        shutil.copyfileobj(source, target, COPY_CHUNK)
+        return
+    while True:
+        with throttled(throttle, THROTTLED_CHUNK):
+            data = source.read(THROTTLED_CHUNK)
+            target.write(data)
+        if not data:
+            break
+
+
+KERNEL_COPIES = [
+    copy for name, copy in (("copy_file_range", copy_range), ("sendfile", copy_sendfile)) if hasattr(os, name)
+]
+
+
+def copy_contents(source, target, size: int, throttle: Throttle | None = None) -> None:
+    # Kernel-side copies first; a fallback is only safe while nothing has
+    # been written to the target yet.
+    for copy in KERNEL_COPIES:
+        try:
+            copy(source.fileno(), target.fileno(), size, throttle)
+            return
+        except OSError as error:
+            if error.errno not in FALLBACK_ERRORS or os.fstat(target.fileno()).st_size:
+                raise
+    copy_stream(source, target, throttle)
+
+
+def copy_file(source: Path, target: Path, throttle: Throttle | None = None) -> int:
+    part = target.with_name(f".{target.name}.part")
+    try:
+        with open(source, "rb") as source_file, open(part, "wb") as target_file:
+            size = os.fstat(source_file.fileno()).st_size
+            copy_contents(source_file, target_file, size, throttle)
+            target_file.flush()
+            os.fsync(target_file.fileno())
+        shutil.copystat(source, part)
+        os.replace(part, target)
+    except BaseException:
+        part.unlink(missing_ok=True)
+        raise
+    return size
+
+
+class NameRegistry:
+    # Names present in each target folder, read with one scandir the first
+    # time a folder is used and kept up to date by the mover afterwards, so
+    # collisions are found without a stat() per file.
+    def __init__(self) -> None:
+        self.folders = {}
+
+    def names(self, folder: Path) -> set:
+        names = self.folders.get(folder)
+        if names is None:
+            try:
+                with os.scandir(folder) as entries:
+                    names = {entry.name for entry in entries}
+            except FileNotFoundError:
+                names = set()
+            self.folders[folder] = names
+        return names
+
+    def unique(self, folder: Path, name: str) -> str:
+        return unique_name(name, self.names(folder).__contains__)
+
+
+def unique_name(name: str, taken) -> str:
+    if not taken(name):
+        return name
+    path = Path(name)
+    number = 1
+    while taken(f"{path.stem}_{number}{path.suffix}"):
+        number += 1
+    return f"{path.stem}_{number}{path.suffix}"
+
+
+def free_target(target: Path, registry: NameRegistry | None = None) -> Path:
+    if registry is not None:
+        return target.with_name(registry.unique(target.parent, target.name))
+    return target.with_name(unique_name(target.name, lambda name: os.path.lexists(target.parent / name)))
+
+
+class Mover:
+    def __init__(
+        self,
+        journal: Journal | None = None,
+        registry: NameRegistry | None = None,
+        throttle: Throttle | None = None,
+    ) -> None:
+        self.devices = {}
+        self.dirs = DirCache()
+        self.stats = MoveStats()
+        self.journal = journal
+        self.registry = registry
+        self.throttle = throttle
+
+    def device(self, folder: Path) -> int:
+        device = self.devices.get(folder)
+        if device is None:
+            device = self.devices[folder] = self.dirs.device(folder)
+        return device
+
+    def is_duplicate(self, source: Path, target: Path) -> bool:
+        try:
+            target_size = target.stat().st_size
+        except FileNotFoundError:
+            return False
+        return target_size == source.stat().st_size and filecmp.cmp(source, target, shallow=False)
+
+    def taken(self, target: Path) -> bool:
+        if self.registry is not None:
+            return target.name in self.registry.names(target.parent)
+        return os.path.lexists(target)
+
+    def move(self, source: Path, target: Path) -> Path:
+        # A name clash is either the same file again, which is dropped, or a
+        # different file, which gets a numbered name instead of overwriting.
+        if self.taken(target):
+            if self.is_duplicate(source, target):
+                source.unlink()
+                self.stats.duplicates += 1
+                return target
+            target = free_target(target, self.registry)
+        if self.registry is not None:
+            self.registry.names(target.parent).add(target.name)
+        if self.device(source.parent) == self.device(target.parent):
+            try:
+                # A rename is atomic and recover has nothing to do for it,
+                # so it is not journaled.
+                with throttled(self.throttle, ops=1):
+                    self.dirs.rename(source, target)
+                self.stats.renamed += 1
+                return target
+            except OSError as error:
+                if error.errno != errno.EXDEV:
+                    raise
+        if self.journal is not None:
+            self.journal.begin("move", source, target, sync=True)
+        start = time.perf_counter()
+        size = copy_file(source, target, self.throttle)
+        if self.journal is not None:
+            self.journal.done("move", source, target)
+        source.unlink()
+        self.stats.copy_seconds += time.perf_counter() - start
+        self.stats.bytes_copied += size
+        self.stats.copied += 1
+        return target
+
+    def close(self) -> None:
+        self.dirs.close()
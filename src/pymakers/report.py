@@ -0,0 +1,81 @@
+import time
+
+MB = 1024 * 1024
+
+
+class SortReport:
+    def __init__(self) -> None:
+        self.files = {}
+        self.bytes = {}
+        self.archives_extracted = 0
+        self.archives_failed = 0
+        self.duplicates = 0
+        self.unknown_extensions = set()
+        self.discovered = 0
+        self.moves = None
+        self.started = time.monotonic()
+        self.finished = None
+
+    def add_file(self, category: str, size: int) -> None:
+        self.files[category] = self.files.get(category, 0) + 1
+        self.bytes[category] = self.bytes.get(category, 0) + size
+
+    def add_archive(self, extracted: bool) -> None:
+        if extracted:
+            self.archives_extracted += 1
+        else:
+            self.archives_failed += 1
+
+    def finish(self) -> None:
+        self.finished = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.started
+
+    @property
+    def total_files(self) -> int:
+        # Files actually sorted; an archive that failed to extract was not.
+        return sum(self.files.values()) + self.archives_extracted
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(self.bytes.values())
+
+    def progress(self) -> dict:
+        # The scan runs alongside the moves, so the ETA only covers files
+        # found so far and grows while scanning continues.
+        elapsed = self.elapsed or 1e-9
+        done = self.total_files + self.archives_failed
+        files_per_second = done / elapsed
+        remaining = max(self.discovered - done, 0)
+        return {
+            "files": done,
+            "discovered": self.discovered,
+            "bytes": self.total_bytes,
+            "files_per_second": files_per_second,
+            "mb_per_second": self.total_bytes / MB / elapsed,
+            "eta": remaining / files_per_second if files_per_second else None,
+        }
+
+    def __str__(self) -> str:
+        lines = [f"OK: sorted {self.total_files} files ({self.total_bytes / MB:.1f} MB) in {self.elapsed:.1f} s"]
+        for category in sorted(self.files):
+            lines.append(f"  {category}: {self.files[category]} files, {self.bytes[category] / MB:.1f} MB")
+        if self.archives_extracted or self.archives_failed:
+            lines.append(f"  archives: {self.archives_extracted} extracted, {self.archives_failed} failed")
+        if self.duplicates:
+            lines.append(f"  duplicates skipped: {self.duplicates}")
+        if self.unknown_extensions:
+            lines.append(f"  unknown extensions: {', '.join(sorted(self.unknown_extensions))}")
+        if self.moves is not None and self.moves.copied:
+            lines.append(f"  {self.moves}")
+        return "\n".join(lines)
+
+
+def format_progress(event: dict) -> str:
+    eta = "?" if event["eta"] is None else f"{event['eta']:.0f} s"
+    return (
+        f"{event['files']}/{event['discovered']} files, {event['bytes'] / MB:.1f} MB, "
+        f"{event['files_per_second']:.0f} files/s, {event['mb_per_second']:.1f} MB/s, ETA {eta}"
+    )
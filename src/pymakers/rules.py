@@ -0,0 +1,165 @@
+import fnmatch
+import json
+import re
+import time
+from pathlib import Path
+
+CATEGORIES = {
+    'images': ['jpeg', 'jpg', 'png', 'svg'],
+    'audio': ['mp3', 'ogg', 'wav', 'amr'],
+    'video': ['avi', 'mp4', 'mov', 'mkv'],
+    'documents': ['doc', 'docx', 'txt', 'pdf', 'xlsx', 'pptx'],
+    'archives': ['zip', 'gz', 'tar', 'tgz']
+}
+SKIPPED_FOLDERS = ('archives', 'video', 'audio', 'documents', 'images', 'other')
+RULE_KEYS = {"target", "extensions", "glob", "regex", "min_size", "max_size", "older_than_days", "newer_than_days"}
+
+
+def get_extension(filename: str) -> str:
+    return Path(filename).suffix[1:].lower()
+
+
+class Rule:
+    def __init__(
+        self,
+        target: str,
+        extensions: list | None = None,
+        glob: str | None = None,
+        regex: str | None = None,
+        min_size: int | None = None,
+        max_size: int | None = None,
+        older_than_days: float | None = None,
+        newer_than_days: float | None = None,
+    ) -> None:
+        if not target or target in ("other", "folder"):
+            raise ValueError(f"Rule target can not be {target!r}")
+        if glob is not None and regex is not None:
+            raise ValueError("Rule can have either glob or regex, not both")
+        self.target = target
+        self.extensions = [ext.lower().lstrip(".") for ext in extensions or []]
+        self.pattern = fnmatch.translate(glob) if glob is not None else regex
+        try:
+            self.compiled = re.compile(self.pattern) if self.pattern is not None else None
+        except re.error as error:
+            raise ValueError(f"Bad pattern for {target!r}: {error}")
+        self.min_size = min_size
+        self.max_size = max_size
+        self.older_than = older_than_days * 86400 if older_than_days is not None else None
+        self.newer_than = newer_than_days * 86400 if newer_than_days is not None else None
+
+    def has_predicates(self) -> bool:
+        return any(value is not None for value in (self.min_size, self.max_size, self.older_than, self.newer_than))
+
+    def check(self, entry, now: float) -> bool:
+        # Extensions are matched by the caller; this checks everything else.
+        if self.compiled is not None and not self.compiled.fullmatch(entry.name):
+            return False
+        if not self.has_predicates():
+            return True
+        stat = entry.stat()
+        if self.min_size is not None and stat.st_size < self.min_size:
+            return False
+        if self.max_size is not None and stat.st_size > self.max_size:
+            return False
+        age = now - stat.st_mtime
+        if self.older_than is not None and age < self.older_than:
+            return False
+        if self.newer_than is not None and age > self.newer_than:
+            return False
+        return True
+
+    def __repr__(self) -> str:
+        return f"Rule({self.target}, {self.extensions}, {self.pattern})"
+
+
+class RuleSet:
+    # Rules are compiled into three stages, tried in this order:
+    #  1. a hash map from extension to target (plus the few extension rules
+    #     that also carry a pattern or a size/age check),
+    #  2. one combined regex over every plain glob/regex rule, or those
+    #     rules one by one when they can not be combined (inline flags,
+    #     groups a backreference may count on),
+    #  3. the remaining size/age rules, in file order.
+    # Within a stage the first rule in the file wins.
+    def __init__(self, rules: list, skip_folders=SKIPPED_FOLDERS) -> None:
+        self.rules = rules
+        self.targets = list(dict.fromkeys(rule.target for rule in rules))
+        self.skip_folders = frozenset(skip_folders).union(target.split("/")[0] for target in self.targets)
+        self.extensions = {}
+        self.extension_rules = {}
+        self.predicate_rules = []
+        patterns = []
+        for rule in rules:
+            if rule.extensions and (rule.compiled is not None or rule.has_predicates()):
+                for ext in rule.extensions:
+                    self.extension_rules.setdefault(ext, []).append(rule)
+            elif rule.extensions:
+                for ext in rule.extensions:
+                    self.extensions.setdefault(ext, rule.target)
+            elif rule.compiled is not None and not rule.has_predicates():
+                patterns.append(rule)
+            else:
+                self.predicate_rules.append(rule)
+        self.pattern_targets = {f"_rule{index}": rule.target for index, rule in enumerate(patterns)}
+        self.pattern = None
+        self.pattern_rules = []
+        if patterns and not any(rule.compiled.groups for rule in patterns):
+            try:
+                self.pattern = re.compile(
+                    "|".join(f"(?P<_rule{index}>{rule.pattern})" for index, rule in enumerate(patterns))
+                )
+            except re.error:
+                pass
+        if patterns and self.pattern is None:
+            self.pattern_rules = patterns
+
+    def classify_name(self, name: str) -> str | None:
+        target = self.extensions.get(get_extension(name))
+        if target is None and self.pattern is not None:
+            match = self.pattern.fullmatch(name)
+            if match is not None:
+                target = self.pattern_targets[match.lastgroup]
+        if target is None:
+            for rule in self.pattern_rules:
+                if rule.compiled.fullmatch(name):
+                    return rule.target
+        return target
+
+    def classify(self, entry, now: float | None = None) -> str:
+        ext_rules = self.extension_rules.get(get_extension(entry.name))
+        if ext_rules:
+            now = now or time.time()
+            for rule in ext_rules:
+                if rule.check(entry, now):
+                    return rule.target
+        target = self.classify_name(entry.name)
+        if target is not None:
+            return target
+        if self.predicate_rules:
+            now = now or time.time()
+            for rule in self.predicate_rules:
+                if rule.check(entry, now):
+                    return rule.target
+        return "other"
+
+    def by_extension(self, ext: str | None) -> str:
+        return self.extensions.get(ext, "other")
+
+
+def default_rules() -> RuleSet:
+    return RuleSet([Rule(category, extensions) for category, extensions in CATEGORIES.items()])
+
+
+def load_rules(filename: Path) -> RuleSet:
+    with open(filename, encoding="utf-8") as file:
+        config = json.load(file)
+    rules = []
+    for options in config.get("rules", []):
+        unknown = set(options).difference(RULE_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown rule options: {', '.join(sorted(unknown))}")
+        rules.append(Rule(**options))
+    return RuleSet(rules, config.get("skip_folders", SKIPPED_FOLDERS))
+
+
+DEFAULT_RULES = default_rules()
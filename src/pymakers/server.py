@@ -0,0 +1,287 @@
+import asyncio
+import json
+import os
+import signal
+import socket
+import sys
+from urllib.parse import parse_qs, unquote, urlsplit
+import bot
+from client import SOCKET_NAME
+
+READ_COMMANDS = {
+    "hello", "help", "show all", "show notes", "phone", "email", "birthday", "birthdays",
+    "search", "page", "notes", "find", "hashtag",
+}
+WRITE_COMMANDS = {"add", "note", "change", "modify", "delete"}
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+MAX_HEADER = 64 * 1024
+MAX_BODY = 1024 * 1024
+WRITE_BATCH = 256
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ApiServer:
+    # Maps the bot command handlers to JSON endpoints:
+    #   GET  /commands              -> {"commands": [...]}
+    #   GET  /commands/<name>?arg=x -> {"result": "..."} (read commands only)
+    #   POST /commands/<name>       -> {"result": "..."}, body {"args": [...]}
+    # Connections are kept alive and pipelined requests are answered in order.
+    # Reads run in the default thread pool on snapshots of the books. Every
+    # write goes through one queue and one writer task, which applies a whole
+    # burst at a time. Saving runs in the thread pool too, one save at a
+    # time; writes made while it runs are saved by the next one.
+    def __init__(self, save: bool = True) -> None:
+        self.save = save
+        self.writes = None
+        self.writer_task = None
+        self.saver_task = None
+        self.unsaved = False
+        self.server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> None:
+        self.writes = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self.write_loop())
+        self.server = await asyncio.start_server(self.handle_connection, host, port, limit=MAX_HEADER)
+
+    async def start_unix(self, path: str = SOCKET_NAME) -> None:
+        self.writes = asyncio.Queue()
+        self.writer_task = asyncio.create_task(self.write_loop())
+        self.server = await asyncio.start_unix_server(self.handle_local, path, limit=MAX_BODY)
+
+    @property
+    def port(self) -> int:
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        self.server.close()
+        await self.server.wait_closed()
+        self.writer_task.cancel()
+        try:
+            await self.writer_task
+        except asyncio.CancelledError:
+            pass
+        if self.saver_task is not None:
+            await self.saver_task
+
+    async def save_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self.unsaved:
+            self.unsaved = False
+            try:
+                await loop.run_in_executor(None, bot.save_books)
+            except Exception as error:
+                print(f"Saving the books failed: {error}")
+
+    async def write_loop(self) -> None:
+        while True:
+            batch = [await self.writes.get()]
+            while not self.writes.empty() and len(batch) < WRITE_BATCH:
+                batch.append(self.writes.get_nowait())
+            for handler, args, future in batch:
+                try:
+                    future.set_result(handler(*args))
+                except Exception as error:
+                    future.set_exception(error)
+            if self.save:
+                self.unsaved = True
+                if self.saver_task is None or self.saver_task.done():
+                    self.saver_task = asyncio.create_task(self.save_loop())
+
+    async def run_command(self, name: str, args: list):
+        try:
+            if name in READ_COMMANDS:
+                return await asyncio.get_running_loop().run_in_executor(None, bot.commands[name], *args)
+            if name in WRITE_COMMANDS:
+                if name == "note" and not (args and bot.extract_hashtags(args[0])):
+                    raise HttpError(400, "A note needs at least one #hashtag")
+                future = asyncio.get_running_loop().create_future()
+                await self.writes.put((bot.commands[name], args, future))
+                return await future
+        except (TypeError, ValueError, KeyError, IndexError) as error:
+            raise HttpError(400, str(error) or error.__class__.__name__)
+        raise HttpError(404, f"Unknown command: {name}")
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> dict:
+        url = urlsplit(target)
+        parts = [unquote(part) for part in url.path.strip("/").split("/")]
+        if parts[0] != "commands" or len(parts) > 2:
+            raise HttpError(404, f"Unknown path: {url.path}")
+        if len(parts) == 1:
+            if method != "GET":
+                raise HttpError(405, "Use GET")
+            return {"commands": sorted(READ_COMMANDS | WRITE_COMMANDS)}
+        name = parts[1].lower()
+        if method == "GET":
+            if name in WRITE_COMMANDS:
+                raise HttpError(405, "Use POST for commands that change data")
+            args = parse_qs(url.query).get("arg", [])
+        elif method == "POST":
+            try:
+                args = json.loads(body or b"{}").get("args", [])
+            except (ValueError, AttributeError):
+                raise HttpError(400, "The body must be a JSON object")
+            if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+                raise HttpError(400, "args must be a list of strings")
+        else:
+            raise HttpError(405, "Use GET or POST")
+        return {"result": await self.run_command(name, args)}
+
+    async def read_request(self, reader: asyncio.StreamReader) -> tuple | None:
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(413, "Headers are too large")
+        lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ")
+        except ValueError:
+            raise HttpError(400, "Malformed request line")
+        headers = {}
+        for line in lines[1:]:
+            if line:
+                key, _, value = line.partition(":")
+                headers[key.strip().lower()] = value.strip()
+        try:
+            length = int(headers.get("content-length") or 0)
+        except ValueError:
+            raise HttpError(400, "Bad Content-Length")
+        if length > MAX_BODY:
+            raise HttpError(413, "Body is too large")
+        body = await reader.readexactly(length) if length else b""
+        connection = headers.get("connection", "").lower()
+        keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+        return method, target, body, keep_alive
+
+    def response(self, status: int, payload: dict, keep_alive: bool) -> bytes:
+        body = json.dumps(payload).encode()
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        return head.encode() + body
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except HttpError as error:
+                    writer.write(self.response(error.status, {"error": str(error)}, False))
+                    break
+                if request is None:
+                    break
+                method, target, body, keep_alive = request
+                try:
+                    status, payload = 200, await self.dispatch(method, target, body)
+                except HttpError as error:
+                    status, payload = error.status, {"error": str(error)}
+                writer.write(self.response(status, payload, keep_alive))
+                # drain() only waits once the transport buffer is over its high
+                # water mark, so pipelined answers are not flushed one by one.
+                await writer.drain()
+                if not keep_alive:
+                    break
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+    async def handle_local(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # One JSON list of command words per line, one JSON reply per line.
+        try:
+            while line := await reader.readline():
+                try:
+                    words = json.loads(line)
+                    if not isinstance(words, list) or not all(isinstance(word, str) for word in words):
+                        raise HttpError(400, "Send a JSON list of words")
+                    reply = {"result": await self.run_command(*parse_words(words))}
+                except HttpError as error:
+                    reply = {"error": str(error), "status": error.status}
+                except ValueError:
+                    reply = {"error": "Send a JSON list of words"}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+def parse_words(words: list) -> tuple:
+    # Same splitting as bot.command_parser, without its interactive prompt
+    # for unknown commands.
+    for size in (2, 1):
+        name = " ".join(words[:size]).lower()
+        if len(words) >= size and name in READ_COMMANDS | WRITE_COMMANDS:
+            args = words[size:]
+            break
+    else:
+        raise HttpError(404, f"Unknown command: {' '.join(words[:1])}")
+    if name == "modify" and len(args) >= 2:
+        args = [args[0], args[1], " ".join(args[2:])]
+    elif name == "note":
+        args = [" ".join(args)]
+    return name, args
+
+
+def is_listening(path: str) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except (FileNotFoundError, ConnectionRefusedError):
+            return False
+    return True
+
+
+async def serve_unix(path: str = SOCKET_NAME) -> None:
+    if os.path.exists(path):
+        if is_listening(path):
+            raise RuntimeError(f"A daemon is already listening on {path}")
+        os.unlink(path)
+    bot.phonebook.load_address_book(bot.filename1)
+    bot.notebook.load_notes(bot.filename2)
+    server = ApiServer()
+    await server.start_unix(path)
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.cancel)
+    print(f"Listening on {path}")
+    try:
+        await stop
+    except asyncio.CancelledError:
+        pass
+    finally:
+        await server.close()
+        os.unlink(path)
+
+
+async def serve(host: str = "127.0.0.1", port: int = 8080) -> None:
+    bot.phonebook.load_address_book(bot.filename1)
+    bot.notebook.load_notes(bot.filename2)
+    server = ApiServer()
+    await server.start(host, port)
+    print(f"Serving on http://{host}:{server.port}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--unix"]:
+        asyncio.run(serve_unix(sys.argv[2] if len(sys.argv) > 2 else SOCKET_NAME))
+    else:
+        asyncio.run(serve(
+            sys.argv[1] if len(sys.argv) > 1 else "127.0.0.1",
+            int(sys.argv[2]) if len(sys.argv) > 2 else 8080,
+        ))
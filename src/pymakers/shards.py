@@ -0,0 +1,207 @@
+import heapq
+import multiprocessing
+import os
+import struct
+import zlib
+from itertools import islice
+from pathlib import Path
+import bot
+from bot import AddressBook, write_atomic
+import codec
+from hamt import PersistentDict
+
+# Shard files are codec address books whose records carry their global
+# number after the book fields, as a fixed-width field so it can be read
+# back from the record's end. Plain book readers skip it.
+SHARD_SCHEMA = codec.SCHEMAS[codec.BOOK] + ",order:u64"
+ORDER = struct.Struct("<Q")
+
+
+def shard_of(name: str, count: int) -> int:
+    # crc32 instead of hash(): str hashes change between processes and runs.
+    return zlib.crc32(name.encode("utf-8")) % count
+
+
+def encode_shard(data, orders: dict) -> bytes:
+    def blobs():
+        for name, record in data.items():
+            payload = codec.encode_record(codec.BOOK, record) + ORDER.pack(orders[name])
+            blob = bytearray()
+            codec.write_varint(blob, len(payload))
+            yield bytes(blob + payload)
+
+    return codec.encode_blobs(codec.BOOK, len(data), blobs(), SHARD_SCHEMA)
+
+
+def decode_shard(data) -> tuple:
+    # Returns (orders, (name, record) pairs).
+    records = codec.decode(data, bot, codec.BOOK)
+    if not codec.read_schema(data).startswith(SHARD_SCHEMA):
+        raise codec.CodecError("Not a shard file")
+    _, _, pos = codec.read_header(data)
+    orders = {}
+    for name, _ in records:
+        length, pos = codec.read_varint(data, pos)
+        pos += length
+        orders[name] = ORDER.unpack_from(data, pos - ORDER.size)[0]
+    return orders, records
+
+
+class Shard:
+    # One worker's part of the book. Every record keeps the global number it
+    # was added under, so the router can merge fan-out results back into
+    # book order; a shard's own dict order is already ascending.
+    def __init__(self, filename: str) -> None:
+        self.filename = filename
+        self.book = AddressBook()
+        self.orders = {}
+        try:
+            with open(filename, "rb") as file:
+                self.orders, data = decode_shard(file.read())
+            self.book.data = PersistentDict(data)
+        except FileNotFoundError:
+            pass
+
+    def add(self, order: int, record) -> None:
+        self.orders.setdefault(record.get_name(), order)
+        self.book.add_record(record)
+
+    def get(self, name: str):
+        return self.book.get_records(name)
+
+    def delete(self, name: str) -> bool:
+        self.orders.pop(name, None)
+        return self.book.data.pop(name, None) is not None
+
+    def size(self) -> int:
+        return len(self.book.data)
+
+    def last_order(self) -> int:
+        return max(self.orders.values(), default=-1)
+
+    def search(self, criteria: str, flag=None) -> list:
+        found = []
+        if flag is not None:
+            criteria = criteria.lower()
+        for name in self.book.data:
+            line = self.book.show_record(name)
+            if (line.lower() if flag is not None else line).find(criteria) >= 0:
+                found.append((self.orders[name], line))
+        return found
+
+    def birthdays(self, days: int) -> list:
+        found = []
+        for name, record in self.book.data.items():
+            if record.get_birthday() is not None:
+                days_left = record.days_to_birthday()
+                if days_left is not None and days_left <= days:
+                    line = f"{name}: birthday: {record.birthday.value} days to birthday: {days_left}"
+                    found.append((self.orders[name], line))
+        return found
+
+    def head(self, count: int) -> list:
+        return [(self.orders[name], str(record)) for name, record in islice(self.book.data.items(), count)]
+
+    def save(self) -> None:
+        write_atomic(self.filename, encode_shard(self.book.data, self.orders))
+
+
+def serve_shard(connection, filename: str) -> None:
+    shard = Shard(filename)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        operation, args = request
+        try:
+            connection.send((True, getattr(shard, operation)(*args)))
+        except Exception as error:
+            connection.send((False, error))
+    connection.close()
+
+
+class ShardedAddressBook:
+    # Records are split by crc32 of the name over one process per shard.
+    # Point operations go to the owning shard only; search, birthdays and
+    # paging go to every shard at once and the sorted partial results are
+    # merged. Each shard lives in its own file next to filename.
+    def __init__(self, shards: int | None = None, filename: str = "address_book.bin") -> None:
+        self.count = shards or os.cpu_count() or 1
+        path = Path(filename)
+        self.filenames = [str(path.with_name(f"{path.stem}.shard{index}{path.suffix}")) for index in range(self.count)]
+        self.connections = []
+        self.processes = []
+        self.next_order = 0
+
+    def start(self) -> "ShardedAddressBook":
+        for filename in self.filenames:
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(target=serve_shard, args=(child, filename), daemon=True)
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+        self.next_order = max(self.scatter("last_order")) + 1
+        return self
+
+    def close(self, save: bool = True) -> None:
+        if save:
+            self.scatter("save")
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+        self.connections = []
+        self.processes = []
+
+    def __enter__(self) -> "ShardedAddressBook":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def receive(connection):
+        ok, value = connection.recv()
+        if not ok:
+            raise value
+        return value
+
+    def call(self, name: str, operation: str, *args):
+        connection = self.connections[shard_of(name, self.count)]
+        connection.send((operation, args))
+        return self.receive(connection)
+
+    def scatter(self, operation: str, *args) -> list:
+        # Every shard starts working before the first answer is read.
+        for connection in self.connections:
+            connection.send((operation, args))
+        return [self.receive(connection) for connection in self.connections]
+
+    def add_record(self, record) -> None:
+        self.call(record.get_name(), "add", self.next_order, record)
+        self.next_order += 1
+
+    def get_records(self, name: str):
+        return self.call(name, "get", name)
+
+    def delete_record(self, name: str) -> bool:
+        return self.call(name, "delete", name)
+
+    def __len__(self) -> int:
+        return sum(self.scatter("size"))
+
+    def search(self, criteria: str, flag=None) -> list:
+        return [line for _, line in heapq.merge(*self.scatter("search", criteria, flag))]
+
+    def birthdays(self, days: int = 7) -> list:
+        return [line for _, line in heapq.merge(*self.scatter("birthdays", int(days)))]
+
+    def page(self, page: int = 1, page_size: int = 3) -> tuple:
+        # Each shard sends its first page * page_size records; the merged
+        # stream is cut to the requested page. Returns (lines, total pages).
+        end = page * page_size
+        merged = heapq.merge(*self.scatter("head", end))
+        lines = [line for _, line in islice(merged, end - page_size, end)]
+        return lines, (len(self) + page_size - 1) // page_size
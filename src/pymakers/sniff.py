@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Enough for the "ustar" magic at offset 257 of a tar header.
+SNIFF_SIZE = 264
+OFFICE_MEMBERS = {b"word/": "docx", b"xl/": "xlsx", b"ppt/": "pptx"}
+
+SIGNATURES = [
+    (0, b"\xff\xd8\xff", "jpg"),
+    (0, b"\x89PNG\r\n\x1a\n", "png"),
+    (0, b"%PDF-", "pdf"),
+    (0, b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", "doc"),
+    (0, b"ID3", "mp3"),
+    (0, b"\xff\xfb", "mp3"),
+    (0, b"\xff\xf3", "mp3"),
+    (0, b"\xff\xf2", "mp3"),
+    (0, b"OggS", "ogg"),
+    (0, b"#!AMR", "amr"),
+    (0, b"\x1a\x45\xdf\xa3", "mkv"),
+    (4, b"ftypqt", "mov"),
+    (4, b"ftyp", "mp4"),
+    (0, b"\x1f\x8b", "gz"),
+    (257, b"ustar", "tar"),
+]
+
+
+def sniff_bytes(head: bytes) -> str | None:
+    if head.startswith(b"PK\x03\x04"):
+        return sniff_zip(head)
+    if head.startswith(b"RIFF"):
+        return {b"WAVE": "wav", b"AVI ": "avi"}.get(head[8:12])
+    for offset, magic, ext in SIGNATURES:
+        if head.startswith(magic, offset):
+            return ext
+    text = head.lstrip()
+    if text.startswith(b"<svg") or (text.startswith(b"<?xml") and b"<svg" in text):
+        return "svg"
+    return None
+
+
+def sniff_zip(head: bytes) -> str:
+    # Office Open XML files are zip archives; the first member name
+    # (at offset 30 of the local file header) tells them apart.
+    name = head[30:30 + int.from_bytes(head[26:28], "little")]
+    for prefix, ext in OFFICE_MEMBERS.items():
+        if name.startswith(prefix):
+            return ext
+    if name == b"[Content_Types].xml":
+        return "docx"
+    return "zip"
+
+
+def sniff_file(filename: Path) -> str | None:
+    try:
+        with open(filename, "rb") as file:
+            head = file.read(SNIFF_SIZE)
+    except OSError:
+        return None
+    return sniff_bytes(head)
+
+
+def sniff_files(filenames: list, workers: int | None = None) -> list:
+    if len(filenames) < 64:
+        return [sniff_file(filename) for filename in filenames]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(sniff_file, filenames))
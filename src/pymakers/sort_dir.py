@@ -1,54 +1,360 @@
+from contextlib import closing
+import os
 from pathlib import Path
+from queue import Full, Queue
 import shutil
 import sys
+import threading
+import time
+from bucket import Bucketer
+from dirs import DirCache
 import file_parser as parser
+from journal import JOURNAL_NAME, Journal, recover
+from manifest import MANIFEST_NAME, load_manifest, remember_file, save_manifest, update_manifest
+from mover import Mover, NameRegistry, free_target, throttled
 from normalize import normalize
+from report import SortReport
+from rules import DEFAULT_RULES, RuleSet, load_rules
+from sniff import sniff_file, sniff_files
+from throttle import MB, Throttle
+from unpack import ARCHIVE_ERRORS, archive_stem, extract_sorted
 
+ARCHIVE_FORMATS = {"zip": "zip", "tar": "tar", "gz": "gztar", "tgz": "gztar"}
+QUEUE_SIZE = 1024
+SNIFF_BATCH = 256
 
-def handle_media(filename: Path, target_folder: Path) -> None:
+
+def handle_media(filename: Path, target_folder: Path, mover: Mover | None = None) -> Path:
+    if mover is not None:
+        mover.dirs.make(target_folder)
+        return mover.move(filename, target_folder / normalize(filename.name))
     target_folder.mkdir(exist_ok=True, parents=True)
-    filename.replace(target_folder / normalize(filename.name))
+    with closing(Mover()) as mover:
+        return mover.move(filename, target_folder / normalize(filename.name))
 
 
-def handle_other(filename: Path, target_folder: Path) -> None:
-    target_folder.mkdir(exist_ok=True, parents=True)
-    filename.replace(target_folder / normalize(filename.name))
+def handle_other(
+    filename: Path, target_folder: Path, registry: NameRegistry | None = None, dirs: DirCache | None = None
+) -> Path:
+    if dirs is None:
+        with closing(DirCache()) as dirs:
+            return handle_other(filename, target_folder, registry, dirs)
+    dirs.make(target_folder)
+    target = target_folder / normalize(filename.name)
+    if target == filename:
+        return target
+    target = free_target(target, registry)
+    dirs.rename(filename, target)
+    if registry is not None:
+        names = registry.names(target_folder)
+        names.discard(filename.name)
+        names.add(target.name)
+    return target
 
 
-def handle_archive(filename: Path, target_folder: Path) -> None:
-    folder_for_file = target_folder / normalize(
-        filename.name.replace(filename.suffix, "")
-    )
-    folder_for_file.mkdir(exist_ok=True, parents=True)
+def handle_archive(
+    filename: Path,
+    target_folder: Path,
+    archive_format: str | None = None,
+    journal: Journal | None = None,
+    throttle: Throttle | None = None,
+    dirs: DirCache | None = None,
+) -> Path | None:
+    if dirs is None:
+        with closing(DirCache()) as dirs:
+            return handle_archive(filename, target_folder, archive_format, journal, throttle, dirs)
+    folder_for_file = target_folder / normalize(archive_stem(filename.name))
+    created = []
+    dirs.make(folder_for_file, created)
+    if journal is not None:
+        journal.begin("extract", filename, folder_for_file, sync=True)
     try:
-        shutil.unpack_archive(str(filename.resolve()), str(folder_for_file.resolve()))
-    except shutil.ReadError:
-        folder_for_file.rmdir()
+        # unpack_archive writes on its own, so the whole archive is charged
+        # up front instead of per chunk.
+        with throttled(throttle, filename.stat().st_size, ops=1):
+            shutil.unpack_archive(str(filename.resolve()), str(folder_for_file.resolve()), archive_format)
+    except ARCHIVE_ERRORS:
+        # The folders made for the archive go with whatever was unpacked
+        # into them; a folder that was already there is left as it is.
+        if created:
+            dirs.rmtree(created[0])
         return None
-    filename.unlink()
+    if journal is not None:
+        journal.done("extract", filename, folder_for_file)
+    dirs.unlink(filename)
+    return folder_for_file
 
 
-def handle_folder(folder: Path) -> None:
+def handle_folder(folder: Path, mover: Mover | None = None) -> None:
     try:
-        folder.rmdir()
+        if mover is not None:
+            mover.dirs.rmdir(folder)
+        else:
+            folder.rmdir()
     except OSError:
         print(f"Sorry, we can not delete the folder: {folder}")
 
 
-def sort_dir(folder: Path) -> str:
-    files = parser.scan(folder)
-    for category in ["images", "audio", "video", "documents"]:
-        for file in files["files"][category]:
-            handle_media(file, folder / category)
-    for file in files["other_files"]:
-        handle_other(file, file.parent)
-    for file in files["files"]["archives"]:
-        handle_archive(file, folder / "archives")
-    for folder in files["folders"][::-1]:
-        handle_folder(folder)
-    return "OK"
+def handle_file(
+    category: str,
+    filename: Path,
+    target: Path,
+    stream_archives: bool = False,
+    mover: Mover | None = None,
+    journal: Journal | None = None,
+    archive_format: str | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+    bucketer: Bucketer | None = None,
+) -> Path | None:
+    if category == "archives":
+        throttle = mover.throttle if mover is not None else None
+        dirs = mover.dirs if mover is not None else None
+        if stream_archives:
+            registry = mover.registry if mover is not None else None
+            return extract_sorted(filename, target, journal, rules, registry, throttle, dirs)
+        return handle_archive(filename, target / "archives", archive_format, journal, throttle, dirs)
+    if category == "other":
+        if mover is None:
+            return handle_other(filename, filename.parent)
+        return handle_other(filename, filename.parent, mover.registry, mover.dirs)
+    if bucketer is not None:
+        return handle_media(filename, bucketer.folder_for(filename, target / category), mover)
+    return handle_media(filename, target / category, mover)
+
+
+def sort_file(
+    filename: Path,
+    folder: Path,
+    stream_archives: bool = False,
+    target: Path | None = None,
+    mover: Mover | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+    bucketer: Bucketer | None = None,
+) -> Path | None:
+    category = rules.classify(filename)
+    archive_format = None
+    if category == "other":
+        ext = sniff_file(filename)
+        category = rules.by_extension(ext)
+        archive_format = ARCHIVE_FORMATS.get(ext)
+    return handle_file(
+        category, filename, target or folder, stream_archives, mover, None, archive_format, rules, bucketer
+    )
+
+
+def with_sizes(entries, report: SortReport):
+    # Runs in the scanner thread, so the stat() for the report overlaps
+    # with the moves instead of needing a second walk.
+    for category, path in entries:
+        if category == "folder":
+            yield category, path, 0
+            continue
+        try:
+            size = os.lstat(path).st_size
+        except FileNotFoundError:
+            continue
+        report.discovered += 1
+        yield category, path, size
+
+
+def stream_entries(entries, queue_size: int = QUEUE_SIZE):
+    # Runs the scan in a thread so moving starts with the first file found;
+    # the bounded queue keeps the scanner at most queue_size entries ahead.
+    queue = Queue(maxsize=queue_size)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                queue.put(item, timeout=0.1)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for entry in entries:
+                if not put(entry):
+                    return
+        except BaseException as error:
+            put(error)
+        else:
+            put(None)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            entry = queue.get()
+            if entry is None:
+                return
+            if isinstance(entry, BaseException):
+                raise entry
+            yield entry
+    finally:
+        stop.set()
+        producer.join()
+
+
+class Sorter:
+    def __init__(
+        self,
+        folder: Path,
+        target: Path | None = None,
+        incremental: bool = False,
+        sniff: bool = True,
+        stream_archives: bool = False,
+        queue_size: int = QUEUE_SIZE,
+        workers: int | None = None,
+        rules: RuleSet = DEFAULT_RULES,
+        progress=None,
+        progress_interval: float = 0.5,
+        bucket: str | None = None,
+        max_entries: int | None = None,
+        throttle: Throttle | None = None,
+    ) -> None:
+        self.folder = folder
+        self.target = target or folder
+        self.incremental = incremental
+        self.sniff = sniff
+        self.stream_archives = stream_archives
+        self.queue_size = queue_size
+        self.workers = workers
+        self.rules = rules
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.last_progress = 0.0
+        self.report = SortReport()
+        self.bucketer = Bucketer(bucket, max_entries) if bucket or max_entries else None
+        self.throttle = throttle
+        self.journal = None
+        self.mover = None
+        self.manifest = None
+        self.moved = {}
+
+    def sort_entry(self, category: str, filename: Path, size: int, archive_format: str | None = None) -> None:
+        moved_to = handle_file(
+            category,
+            filename,
+            self.target,
+            self.stream_archives,
+            self.mover,
+            self.journal,
+            archive_format,
+            self.rules,
+            self.bucketer,
+        )
+        if category == "archives":
+            self.report.add_archive(moved_to is not None)
+        else:
+            self.report.add_file(category, size)
+            if category == "other" and parser.get_extension(filename.name):
+                self.report.unknown_extensions.add(parser.get_extension(filename.name))
+            if self.manifest is not None:
+                remember_file(self.moved, filename, moved_to)
+        if self.progress is not None and time.monotonic() - self.last_progress >= self.progress_interval:
+            self.last_progress = time.monotonic()
+            self.progress(self.report.progress())
+
+    def sort_unknown(self, unknown: list) -> None:
+        filenames = [filename for filename, _ in unknown]
+        for (filename, size), ext in zip(unknown, sniff_files(filenames)):
+            self.sort_entry(self.rules.by_extension(ext), filename, size, ARCHIVE_FORMATS.get(ext))
+
+    def run(self) -> SortReport:
+        if recover(self.folder / JOURNAL_NAME):
+            print("Resuming an interrupted sort")
+        self.journal = Journal(self.folder / JOURNAL_NAME)
+        self.mover = Mover(self.journal, NameRegistry(), self.throttle)
+        if self.incremental:
+            self.manifest = load_manifest(self.folder / MANIFEST_NAME)
+        tree = {} if self.manifest is not None else None
+        folders = []
+        unknown = []
+        if self.workers:
+            entries = parser.scan_iter_parallel(self.folder, self.workers, self.manifest, tree, self.rules)
+        else:
+            entries = parser.scan_iter(self.folder, self.manifest, tree, self.rules)
+        for category, path, size in stream_entries(with_sizes(entries, self.report), self.queue_size):
+            if category == "folder":
+                folders.append(path)
+            elif category == "other" and self.sniff:
+                unknown.append((path, size))
+                if len(unknown) >= SNIFF_BATCH:
+                    self.sort_unknown(unknown)
+                    unknown = []
+            else:
+                self.sort_entry(category, path, size)
+        self.sort_unknown(unknown)
+        for subfolder in folders[::-1]:
+            handle_folder(subfolder, self.mover)
+        if self.manifest is not None:
+            update_manifest(self.manifest, tree, self.moved)
+            save_manifest(self.folder / MANIFEST_NAME, self.manifest)
+        self.journal.close()
+        self.mover.close()
+        self.report.duplicates = self.mover.stats.duplicates
+        self.report.moves = self.mover.stats
+        self.report.finish()
+        if self.progress is not None:
+            self.progress(self.report.progress())
+        return self.report
+
+
+def sort_dir(
+    folder: Path,
+    incremental: bool = False,
+    sniff: bool = True,
+    stream_archives: bool = False,
+    target: Path | None = None,
+    workers: int | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+    progress=None,
+    bucket: str | None = None,
+    max_entries: int | None = None,
+    throttle: Throttle | None = None,
+) -> SortReport:
+    return Sorter(
+        folder,
+        target,
+        incremental,
+        sniff,
+        stream_archives,
+        workers=workers,
+        rules=rules,
+        progress=progress,
+        bucket=bucket,
+        max_entries=max_entries,
+        throttle=throttle,
+    ).run()
 
 
 if __name__ == "__main__":
     folder_for_scan = Path(sys.argv[1])
-    sort_dir(folder_for_scan.resolve())
+    flags = {arg for arg in sys.argv[2:] if "=" not in arg}
+    options = dict(arg.split("=", 1) for arg in sys.argv[2:] if "=" in arg)
+    rules = load_rules(Path(options["--rules"])) if "--rules" in options else DEFAULT_RULES
+    if "--watch" in flags:
+        from watch import watch_dir
+        watch_dir(folder_for_scan.resolve(), rules=rules)
+    elif "--view" in options:
+        from view import build_view
+        print(build_view(folder_for_scan, Path(options["--view"]), rules))
+    else:
+        throttle = Throttle(
+            float(options["--max-mbps"]) * MB if "--max-mbps" in options else None,
+            float(options["--max-ops"]) if "--max-ops" in options else None,
+            "--low-priority" in flags,
+        )
+        print(sort_dir(
+            folder_for_scan.resolve(),
+            "--incremental" in flags,
+            stream_archives="--stream-archives" in flags,
+            target=Path(options["--target"]).resolve() if "--target" in options else None,
+            workers=int(options.get("--workers", 0)) or None,
+            rules=rules,
+            bucket=options.get("--bucket"),
+            max_entries=int(options.get("--max-entries", 0)) or None,
+            throttle=throttle,
+        ))
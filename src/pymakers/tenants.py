@@ -0,0 +1,161 @@
+import threading
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from bot import AddressBook, Notebook, filename1, filename2
+import lazy
+
+# Memory of one decoded record with a phone and an email, measured with
+# tracemalloc.
+RECORD_BYTES = 600
+
+
+def memory_size(data) -> int:
+    # Estimate of the memory a book takes: a lazy book holds its file and
+    # index, plus the records it has decoded or changed.
+    if isinstance(data, lazy.LazyDict):
+        store = data.store
+        changed, added, _ = data.state
+        index = store.offsets.itemsize * len(store.offsets) + store.slots.itemsize * len(store.slots)
+        return len(store.data) + index + RECORD_BYTES * (len(store.cache) + len(changed) + len(added))
+    return RECORD_BYTES * len(data)
+
+
+class Tenant:
+    def __init__(self, name: str, folder: Path) -> None:
+        self.name = name
+        self.folder = folder
+        self.phonebook = AddressBook()
+        self.notebook = Notebook()
+        self.dirty = False
+        self.users = 0
+        self.size = 0
+        # Held by write sessions and saves, so a save never sees half of a
+        # session's changes and two writers take turns.
+        self.lock = threading.RLock()
+
+    def files(self) -> tuple:
+        return self.folder / filename1, self.folder / filename2
+
+    def measure(self) -> None:
+        self.size = memory_size(self.phonebook.data) + memory_size(self.notebook.data)
+
+    def load(self) -> None:
+        book_file, notes_file = self.files()
+        self.phonebook.load_address_book(book_file)
+        self.notebook.load_notes(notes_file)
+        self.measure()
+
+    def save(self) -> None:
+        with self.lock:
+            book_file, notes_file = self.files()
+            self.folder.mkdir(parents=True, exist_ok=True)
+            self.phonebook.save_address_book(book_file)
+            self.notebook.save_notes(notes_file)
+            self.dirty = False
+
+
+class StoreManager:
+    # Opens the books of a tenant (root/<tenant>/address_book.bin and
+    # note_book.bin) on first use and keeps the most recently used ones
+    # loaded, bounded by max_tenants and by max_bytes of estimated memory,
+    # re-measured after every session. A dirty tenant is saved after it is
+    # dropped, outside the manager lock; until that save is done it waits
+    # in evicting, where open() takes it back instead of reading stale
+    # files. A tenant inside a session is never dropped.
+    def __init__(self, root: Path, max_tenants: int = 64, max_bytes: int | None = None) -> None:
+        self.root = root
+        self.max_tenants = max_tenants
+        self.max_bytes = max_bytes
+        self.tenants = {}
+        self.evicting = {}
+        self.stats = {}
+        self.lock = threading.Lock()
+
+    def count(self, name: str, key: str) -> None:
+        stats = self.stats.setdefault(name, {"hits": 0, "misses": 0, "evictions": 0, "flushes": 0})
+        stats[key] += 1
+
+    def open(self, name: str, hold: bool = False) -> Tenant:
+        if not name or name in (".", "..") or "/" in name or "\\" in name:
+            raise ValueError(f"Invalid tenant name: {name!r}")
+        with self.lock:
+            tenant = self.tenants.pop(name, None) or self.evicting.pop(name, None)
+            if tenant is not None:
+                self.count(name, "hits")
+            else:
+                self.count(name, "misses")
+                tenant = Tenant(name, self.root / name)
+                tenant.load()
+            self.tenants[name] = tenant
+            if hold:
+                tenant.users += 1
+            dropped = self.evict()
+        for evicted in dropped:
+            self.write_back(evicted)
+        return tenant
+
+    def over_limit(self) -> bool:
+        if len(self.tenants) > self.max_tenants:
+            return True
+        return self.max_bytes is not None and sum(tenant.size for tenant in self.tenants.values()) > self.max_bytes
+
+    def evict(self) -> list:
+        # Oldest first; the tenant just opened is last and always stays.
+        # Returns the dirty tenants dropped, for write_back.
+        dropped = []
+        for name in list(self.tenants)[:-1]:
+            if not self.over_limit():
+                break
+            tenant = self.tenants[name]
+            if tenant.users:
+                continue
+            del self.tenants[name]
+            self.count(name, "evictions")
+            if tenant.dirty:
+                self.evicting[name] = tenant
+                dropped.append(tenant)
+        return dropped
+
+    def write_back(self, tenant: Tenant) -> None:
+        # Called without the manager lock.
+        with tenant.lock:
+            if tenant.dirty:
+                tenant.save()
+                with self.lock:
+                    self.count(tenant.name, "flushes")
+        with self.lock:
+            if self.evicting.get(tenant.name) is tenant:
+                del self.evicting[tenant.name]
+
+    @contextmanager
+    def session(self, name: str, write: bool = False):
+        tenant = self.open(name, hold=True)
+        try:
+            with tenant.lock if write else nullcontext():
+                try:
+                    yield tenant
+                finally:
+                    if write:
+                        tenant.dirty = True
+                    tenant.measure()
+        finally:
+            # The session may have grown the books past max_bytes.
+            with self.lock:
+                tenant.users -= 1
+                dropped = self.evict()
+            for evicted in dropped:
+                self.write_back(evicted)
+
+    def flush(self) -> None:
+        with self.lock:
+            tenants = list(self.tenants.values())
+        for tenant in tenants:
+            with tenant.lock:
+                if tenant.dirty:
+                    tenant.save()
+                    with self.lock:
+                        self.count(tenant.name, "flushes")
+
+    def metrics(self) -> dict:
+        with self.lock:
+            return {name: dict(stats, loaded=name in self.tenants) for name, stats in self.stats.items()}
@@ -0,0 +1,83 @@
+import threading
+import time
+from contextlib import contextmanager
+
+MB = 1024 * 1024
+MAX_PENALTY = 1.0
+
+
+class TokenBucket:
+    def __init__(self, rate: float | None = None, burst: float | None = None) -> None:
+        self.lock = threading.Lock()
+        self.rate = None
+        self.burst = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate, burst)
+
+    def set_rate(self, rate: float | None, burst: float | None = None) -> None:
+        with self.lock:
+            self.rate = rate
+            self.burst = burst if burst is not None else (rate or 0.0)
+            self.tokens = min(self.tokens, self.burst)
+
+    def acquire(self, amount: float) -> None:
+        # Callers may take more than the burst at once; the bucket goes into
+        # debt and later callers wait until it is paid back.
+        with self.lock:
+            if not self.rate or amount <= 0:
+                return
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class Throttle:
+    # One instance is shared by every worker of a run, so the limits apply
+    # to the run as a whole. In low priority mode each operation is timed
+    # and a growing pause is added while storage latency stays above
+    # latency_target, then halved again once it recovers.
+    def __init__(
+        self,
+        bytes_per_second: float | None = None,
+        ops_per_second: float | None = None,
+        low_priority: bool = False,
+        latency_target: float = 0.05,
+    ) -> None:
+        self.bytes = TokenBucket(bytes_per_second)
+        self.ops = TokenBucket(ops_per_second)
+        self.low_priority = low_priority
+        self.latency_target = latency_target
+        self.penalty = 0.0
+        self.lock = threading.Lock()
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.bytes.rate or self.ops.rate or self.low_priority)
+
+    def set_limits(self, bytes_per_second: float | None = None, ops_per_second: float | None = None) -> None:
+        self.bytes.set_rate(bytes_per_second)
+        self.ops.set_rate(ops_per_second)
+
+    def observe(self, elapsed: float) -> None:
+        with self.lock:
+            if elapsed > self.latency_target:
+                self.penalty = min(MAX_PENALTY, max(self.penalty * 2, 0.01))
+            else:
+                self.penalty = self.penalty / 2 if self.penalty > 0.001 else 0.0
+
+    @contextmanager
+    def io(self, size: int = 0, ops: int = 1):
+        self.ops.acquire(ops)
+        self.bytes.acquire(size)
+        if self.penalty:
+            time.sleep(self.penalty)
+        start = time.monotonic()
+        yield
+        if self.low_priority:
+            self.observe(time.monotonic() - start)
+
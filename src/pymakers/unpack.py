@@ -0,0 +1,106 @@
+from contextlib import closing
+import lzma
+import tarfile
+import zipfile
+import zlib
+from pathlib import Path, PurePosixPath
+from dirs import DirCache
+from journal import Journal
+from mover import NameRegistry, copy_stream, free_target
+from normalize import normalize
+from rules import DEFAULT_RULES, RuleSet
+from throttle import Throttle
+
+# What a broken archive raises while it is read. Bad bz2 data raises
+# OSError, shutil.ReadError is an OSError too.
+ARCHIVE_ERRORS = (zipfile.BadZipFile, tarfile.TarError, EOFError, OSError, zlib.error, lzma.LZMAError)
+ARCHIVE_SUFFIXES = (".tar.gz", ".tar.bz2", ".tar.xz", ".tgz", ".tbz2", ".txz", ".zip", ".tar", ".gz")
+
+
+def archive_stem(name: str) -> str:
+    lower_name = name.lower()
+    for suffix in ARCHIVE_SUFFIXES:
+        if lower_name.endswith(suffix) and len(name) > len(suffix):
+            return name[:-len(suffix)]
+    return Path(name).stem
+
+
+def iter_members(filename: Path):
+    if zipfile.is_zipfile(filename):
+        with zipfile.ZipFile(filename) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    with archive.open(info) as member:
+                        yield info.filename, member
+        return
+    with tarfile.open(filename, "r:*") as archive:
+        for info in archive:
+            if info.isfile():
+                yield info.name, archive.extractfile(info)
+
+
+def member_target(name: str, folder: Path, unsorted_folder: Path, rules: RuleSet = DEFAULT_RULES) -> Path | None:
+    # None for names with nothing left to use, like "../..".
+    parts = [normalize(part) for part in PurePosixPath(name).parts if part not in ("", ".", "..", "/")]
+    if not parts:
+        return None
+    category = rules.classify_name(parts[-1])
+    if category is None or category == "archives":
+        return unsorted_folder.joinpath(*parts)
+    return folder / category / parts[-1]
+
+
+def extract_sorted(
+    filename: Path,
+    folder: Path,
+    journal: Journal | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+    registry: NameRegistry | None = None,
+    throttle: Throttle | None = None,
+    dirs: DirCache | None = None,
+) -> Path | None:
+    # Members go straight into their category folders, so every byte is
+    # written once instead of being unpacked and then moved again.
+    # On a broken archive every file and folder made for it is removed; a
+    # target is recorded before it is opened, so a half-written member goes
+    # too.
+    if dirs is None:
+        with closing(DirCache()) as dirs:
+            return extract_sorted(filename, folder, journal, rules, registry, throttle, dirs)
+    unsorted_folder = folder / "archives" / normalize(archive_stem(filename.name))
+    written = []
+    created = []
+    if journal is not None:
+        journal.begin("extract", filename, unsorted_folder, sync=True)
+    try:
+        for name, member in iter_members(filename):
+            target = member_target(name, folder, unsorted_folder, rules)
+            if target is None:
+                continue
+            dirs.make(target.parent, created)
+            target = free_target(target, registry)
+            if registry is not None:
+                registry.names(target.parent).add(target.name)
+            if journal is not None:
+                journal.begin("write", filename, target)
+            written.append(target)
+            with open(dirs.create(target), "wb") as file:
+                copy_stream(member, file, throttle)
+    except ARCHIVE_ERRORS:
+        for target in written:
+            try:
+                dirs.unlink(target)
+            except FileNotFoundError:
+                pass
+            if registry is not None:
+                registry.names(target.parent).discard(target.name)
+        for created_folder in reversed(created):
+            try:
+                dirs.rmdir(created_folder)
+            except OSError:
+                pass
+        return None
+    if journal is not None:
+        journal.done("extract", filename, unsorted_folder)
+    dirs.unlink(filename)
+    return unsorted_folder
@@ -0,0 +1,107 @@
+import copy
+import errno
+import os
+from pathlib import Path
+import file_parser as parser
+from manifest import load_manifest, save_manifest
+from mover import NameRegistry
+from normalize import normalize
+from report import SortReport
+from rules import DEFAULT_RULES, RuleSet
+from sniff import sniff_files
+
+VIEW_MANIFEST_NAME = ".pymakers_view"
+LINK_TYPES = ("auto", "hard", "symbolic")
+SNIFF_BATCH = 256
+
+
+class ViewBuilder:
+    # Builds the category layout of sort_dir out of links to the source
+    # files. The source tree is only read. The view manifest maps every
+    # source file to its link, so a re-run only links new or changed files
+    # and removes links whose source is gone.
+    def __init__(self, source: Path, view_root: Path, rules: RuleSet = DEFAULT_RULES, link_type: str = "auto") -> None:
+        if link_type not in LINK_TYPES:
+            raise ValueError(f"Unknown link type: {link_type}")
+        self.source = source.resolve()
+        self.view_root = view_root.resolve()
+        if self.view_root == self.source or self.source in self.view_root.parents:
+            raise ValueError("The view folder can not be inside the source folder")
+        self.rules = rules
+        # Folders named like categories are only skipped when sorting in
+        # place; the view is outside the source, so all of it is scanned.
+        self.scan_rules = copy.copy(rules)
+        self.scan_rules.skip_folders = frozenset()
+        self.link_type = link_type
+        self.registry = NameRegistry()
+        self.report = SortReport()
+        self.known = {}
+        self.current = {}
+        self.hard = False
+
+    def link(self, source: Path, target: Path) -> None:
+        if self.hard:
+            try:
+                os.link(source, target)
+                return
+            except OSError as error:
+                if self.link_type == "hard" or error.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+        os.symlink(source, target)
+
+    def add(self, category: str, filename: Path) -> None:
+        stat = filename.stat()
+        state = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        key = str(filename)
+        old = self.known.get(key)
+        if old is not None:
+            old_link = Path(old[0])
+            if old[1:] == state and old_link.name in self.registry.names(old_link.parent):
+                self.current[key] = old
+                return
+            old_link.unlink(missing_ok=True)
+            self.registry.names(old_link.parent).discard(old_link.name)
+        folder = self.view_root / category
+        folder.mkdir(exist_ok=True, parents=True)
+        names = self.registry.names(folder)
+        target = folder / self.registry.unique(folder, normalize(filename.name))
+        self.link(filename, target)
+        names.add(target.name)
+        self.current[key] = (str(target),) + state
+        self.report.add_file(category, stat.st_size)
+
+    def add_unknown(self, filenames: list) -> None:
+        for filename, ext in zip(filenames, sniff_files(filenames)):
+            self.add(self.rules.by_extension(ext), filename)
+
+    def build(self) -> SortReport:
+        self.view_root.mkdir(exist_ok=True, parents=True)
+        manifest = load_manifest(self.view_root / VIEW_MANIFEST_NAME)
+        self.known = manifest["files"]
+        self.hard = self.link_type == "hard" or (
+            self.link_type == "auto" and os.stat(self.source).st_dev == os.stat(self.view_root).st_dev
+        )
+        unknown = []
+        for category, filename in parser.scan_iter(self.source, rules=self.scan_rules):
+            if category == "folder":
+                continue
+            if category == "other":
+                unknown.append(filename)
+                if len(unknown) >= SNIFF_BATCH:
+                    self.add_unknown(unknown)
+                    unknown = []
+            else:
+                self.add(category, filename)
+        self.add_unknown(unknown)
+        for key in set(self.known).difference(self.current):
+            Path(self.known[key][0]).unlink(missing_ok=True)
+        manifest["files"] = self.current
+        save_manifest(self.view_root / VIEW_MANIFEST_NAME, manifest)
+        self.report.finish()
+        return self.report
+
+
+def build_view(
+    source: Path, view_root: Path, rules: RuleSet = DEFAULT_RULES, link_type: str = "auto"
+) -> SortReport:
+    return ViewBuilder(source, view_root, rules, link_type).build()
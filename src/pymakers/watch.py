@@ -0,0 +1,112 @@
+import os
+import threading
+import time
+from pathlib import Path
+import file_parser as parser
+from rules import DEFAULT_RULES, RuleSet
+from sort_dir import sort_file
+
+
+class FolderSnapshot:
+    def __init__(self, folder: Path, skip_folders=parser.SKIPPED_FOLDERS) -> None:
+        self.folder = folder
+        self.skip_folders = skip_folders
+        self.folders = {}
+
+    def poll(self) -> list:
+        new_files = []
+        self._poll_folder(str(self.folder), new_files)
+        return new_files
+
+    def _poll_folder(self, path: str, new_files: list) -> None:
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            self._forget(path)
+            return
+        known = self.folders.get(path)
+        if known is not None and known[0] == mtime:
+            for subfolder in known[2]:
+                self._poll_folder(subfolder, new_files)
+            return
+        names = set()
+        subfolders = []
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    if entry.name not in self.skip_folders:
+                        subfolders.append(entry.path)
+                elif entry.name not in parser.IGNORED_FILES:
+                    names.add(entry.name)
+                    if known is None or entry.name not in known[1]:
+                        new_files.append(Path(entry.path))
+        if known is not None:
+            for subfolder in set(known[2]).difference(subfolders):
+                self._forget(subfolder)
+        self.folders[path] = (mtime, names, tuple(subfolders))
+        for subfolder in subfolders:
+            self._poll_folder(subfolder, new_files)
+
+    def _forget(self, path: str) -> None:
+        known = self.folders.pop(path, None)
+        if known is not None:
+            for subfolder in known[2]:
+                self._forget(subfolder)
+
+
+def watch_dir(
+    folder: Path,
+    min_interval: float = 0.5,
+    max_interval: float = 10.0,
+    settle: float = 1.0,
+    batch_size: int = 1000,
+    max_wait: float = 5.0,
+    stop: threading.Event | None = None,
+    rules: RuleSet = DEFAULT_RULES,
+) -> str:
+    stop = stop or threading.Event()
+    snapshot = FolderSnapshot(folder, rules.skip_folders)
+    pending = {}
+    ready_since = None
+    interval = min_interval
+    try:
+        while not stop.is_set():
+            now = time.monotonic()
+            arrived = snapshot.poll()
+            for file in arrived:
+                pending.setdefault(file, None)
+            ready = []
+            for file, seen in list(pending.items()):
+                try:
+                    stat = file.stat()
+                except FileNotFoundError:
+                    del pending[file]
+                    continue
+                state = (stat.st_size, stat.st_mtime_ns)
+                if seen is None or seen[:2] != state:
+                    pending[file] = state + (now,)
+                elif now - seen[2] >= settle:
+                    ready.append(file)
+            # Files arriving in a burst are moved together once the burst
+            # settles, as soon as a full batch is ready, or after max_wait
+            # seconds, so a steady trickle of arrivals can not hold them back.
+            if not ready:
+                ready_since = None
+            elif ready_since is None:
+                ready_since = now
+            if ready and (not arrived or len(ready) >= batch_size or now - ready_since >= max_wait):
+                ready_since = None
+                for file in ready:
+                    del pending[file]
+                    try:
+                        sort_file(file, folder, rules=rules)
+                    except OSError as error:
+                        print(f"Sorry, we can not sort the file: {file} ({error})")
+            if arrived or pending:
+                interval = min_interval
+            else:
+                interval = min(interval * 2, max_interval)
+            stop.wait(interval)
+    except KeyboardInterrupt:
+        pass
+    return "OK"
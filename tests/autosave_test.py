@@ -0,0 +1,89 @@
+import threading
+import time
+
+import autosave
+import bot
+
+
+def test_autosaver_coalesces_a_burst_into_one_save():
+    saved = threading.Event()
+    calls = []
+    saver = autosave.AutoSaver(lambda: (calls.append(time.monotonic()), saved.set()), max_changes=100, max_delay=0.1)
+    saver.start()
+    start = time.monotonic()
+    for _ in range(20):
+        saver.changed()
+    assert saved.wait(2)
+    saver.stop()
+    assert len(calls) == 1
+    assert calls[0] - start >= 0.09
+
+
+def test_autosaver_saves_after_max_changes_and_on_stop():
+    calls = []
+    saver = autosave.AutoSaver(lambda: calls.append(1), max_changes=3, max_delay=60).start()
+    for _ in range(3):
+        saver.changed()
+    deadline = time.monotonic() + 2
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert len(calls) == 1
+    saver.changed()
+    saver.stop()
+    assert len(calls) == 2
+
+
+def test_autosaver_keeps_running_after_a_failed_save():
+    calls = []
+
+    def save():
+        calls.append(1)
+        if len(calls) == 1:
+            raise ValueError("broken record")
+
+    saver = autosave.AutoSaver(save, max_changes=1, max_delay=60).start()
+    saver.changed()
+    deadline = time.monotonic() + 2
+    while not calls and time.monotonic() < deadline:
+        time.sleep(0.01)
+    saver.changed()
+    saver.stop()
+    assert len(calls) == 2 and saver.saves == 1
+
+
+def test_autosaver_retries_a_failed_save():
+    calls = []
+
+    def save():
+        calls.append(1)
+        if len(calls) == 1:
+            raise OSError("disk full")
+
+    saver = autosave.AutoSaver(save, max_changes=1, max_delay=0.05).start()
+    saver.changed()
+    deadline = time.monotonic() + 2
+    while not saver.saves and time.monotonic() < deadline:
+        time.sleep(0.01)
+    saver.stop()
+    assert len(calls) == 2 and saver.saves == 1 and saver.changes == 0
+
+
+def test_save_is_atomic(tmp_path, monkeypatch):
+    filename = tmp_path / "address_book.bin"
+    book = bot.AddressBook(bot.Record(bot.Name("alice"), phone="0501111111"))
+    book.save_address_book(filename)
+    book.add_record(bot.Record(bot.Name("bob"), phone="0502222222"))
+
+    def broken_fsync(fd):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(bot.os, "fsync", broken_fsync)
+    try:
+        book.save_address_book(filename)
+    except OSError:
+        pass
+    monkeypatch.undo()
+    loaded = bot.AddressBook()
+    loaded.load_address_book(filename)
+    assert list(loaded.data) == ["alice"]
+    assert [path.name for path in tmp_path.iterdir()] == ["address_book.bin"]
@@ -0,0 +1,73 @@
+import sys
+import threading
+
+import pytest
+
+import bot
+
+NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi"]
+
+
+@pytest.fixture
+def books(monkeypatch):
+    monkeypatch.setattr(bot, "phonebook", bot.AddressBook())
+    monkeypatch.setattr(bot, "notebook", bot.Notebook())
+    monkeypatch.setattr(bot, "books_lock", threading.Lock())
+
+
+def test_mixed_workload_across_threads(books):
+    old_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    errors = []
+    stop = threading.Event()
+
+    def reader():
+        try:
+            while not stop.is_set():
+                for line in bot.show_all().splitlines():
+                    # A record is only visible once it has its phone.
+                    assert line == "The phonebook is empty" or "phones: 0" in line
+                bot.search_by_criteria("0", "i")
+                bot.remaining_days(365)
+                bot.iteration(1, 2)
+        except Exception as error:
+            errors.append(error)
+
+    def writer(name):
+        try:
+            for round in range(50):
+                bot.add_user(name, f"050{round:07d}")
+                bot.store_note(f"note {round}", [f"#{name}"])
+                bot.del_record(name)
+            bot.add_user(name, "0501234567")
+        except Exception as error:
+            errors.append(error)
+
+    readers = [threading.Thread(target=reader) for _ in range(4)]
+    writers = [threading.Thread(target=writer, args=(name,)) for name in NAMES]
+    try:
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+    finally:
+        sys.setswitchinterval(old_interval)
+    assert errors == []
+    assert sorted(bot.phonebook.data) == NAMES
+    assert all(len(record.phones) == 1 for record in bot.phonebook.data.values())
+    assert all(len(bot.notebook.data[f"#{name}"].notes) == 50 for name in NAMES)
+
+
+def test_sort_command_answers_bad_modes(tmp_path):
+    (tmp_path / "rules.json").write_text("{not json")
+    assert bot.sorting_directory(str(tmp_path), "bucket", "weird").startswith("Unknown bucket strategy: weird")
+    assert bot.sorting_directory(str(tmp_path), "throttle", "abc").startswith("The speed must be")
+    assert bot.sorting_directory(str(tmp_path), "throttle", "-1").startswith("The speed must be")
+    assert bot.sorting_directory(str(tmp_path), "rules", str(tmp_path / "rules.json")).startswith("Can not use")
+    assert bot.sorting_directory(str(tmp_path), "rules", str(tmp_path / "missing.json")).startswith("Can not use")
+    assert bot.sorting_directory(str(tmp_path), "incremantal").startswith("Unknown sort mode: incremantal")
+    assert bot.sorting_directory(str(tmp_path), "into") == "Use: sort folder into target_folder"
+    assert bot.sorting_directory(str(tmp_path / "missing")).startswith("There is no folder")
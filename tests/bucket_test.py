@@ -0,0 +1,55 @@
+import os
+import struct
+from datetime import datetime
+from pathlib import Path
+
+import pymakers.bucket as bucket
+import pymakers.sort_dir as sort
+
+
+def exif_jpeg(date: str) -> bytes:
+    # Little-endian TIFF: IFD0 with an Exif IFD pointer, Exif IFD with DateTimeOriginal.
+    value = date.encode("ascii") + b"\x00"
+    ifd0 = struct.pack("<H", 1) + struct.pack("<HHII", 0x8769, 4, 1, 26) + struct.pack("<I", 0)
+    exif_ifd = struct.pack("<H", 1) + struct.pack("<HHII", 0x9003, 2, len(value), 44) + struct.pack("<I", 0)
+    tiff = b"II*\x00" + struct.pack("<I", 8) + ifd0 + exif_ifd + value
+    app1 = b"Exif\x00\x00" + tiff
+    return b"\xff\xd8" + b"\xff\xe0\x00\x04ab" + b"\xff\xe1" + struct.pack(">H", len(app1) + 2) + app1 + b"\xff\xd9"
+
+
+def test_read_exif_date(tmp_path):
+    (tmp_path / "photo.jpg").write_bytes(exif_jpeg("2021:07:14 10:20:30"))
+    assert bucket.read_exif_date(tmp_path / "photo.jpg") == datetime(2021, 7, 14, 10, 20, 30)
+    (tmp_path / "plain.jpg").write_bytes(b"\xff\xd8\xff\xd9")
+    assert bucket.read_exif_date(tmp_path / "plain.jpg") is None
+
+
+def test_sort_dir_buckets_by_exif_and_mtime(tmp_path):
+    (tmp_path / "photo.jpg").write_bytes(exif_jpeg("2021:07:14 10:20:30"))
+    (tmp_path / "song.mp3").write_bytes(b"mp3")
+    timestamp = datetime(2019, 3, 5).timestamp()
+    os.utime(tmp_path / "song.mp3", (timestamp, timestamp))
+    sort.sort_dir(tmp_path, bucket="exif")
+    assert (tmp_path / "images" / "2021" / "07" / "photo.jpg").exists()
+    assert (tmp_path / "audio" / "2019" / "03" / "song.mp3").exists()
+
+
+def test_max_entries_spills_into_numbered_subfolders(tmp_path):
+    for i in range(20):
+        (tmp_path / f"doc{i}.txt").write_text(str(i))
+    sort.sort_dir(tmp_path, max_entries=4)
+    documents = tmp_path / "documents"
+    names = sorted(os.listdir(documents))
+    assert names[:2] == ["0002", "0003"] and len(names) == 4
+    files = []
+    for folder, subfolders, names in os.walk(documents):
+        assert len(subfolders) + len(names) <= 4
+        files += names
+    assert len(files) == 20
+
+
+def test_max_entries_grows_in_depth_slowly():
+    bucketer = bucket.Bucketer(max_entries=100)
+    folders = [bucketer.folder_for(Path(f"f{i}.txt"), Path("/nonexistent")) for i in range(20000)]
+    assert max(len(folder.parts) for folder in folders) <= 4
+    assert max(bucketer.counts.values()) == 100
@@ -0,0 +1,83 @@
+import io
+import pickle
+
+import pytest
+
+import bot
+import codec
+
+
+def make_book(name_for, count: int) -> list:
+    records = []
+    for number in range(count):
+        record = bot.Record(bot.Name(name_for(number)))
+        record.add_phone(f"0{number:09d}")
+        if number % 2 == 0:
+            record.add_email(f"user{number}@example.com")
+        if number % 3 == 0:
+            record.add_birthday("29.02.2000")
+        records.append(record)
+    return records
+
+
+def test_round_trip(tmp_path):
+    filename = tmp_path / "address_book.bin"
+    book = bot.AddressBook()
+    record = bot.Record(bot.Name("alice"), phone="0501111111")
+    record.add_phone("0502222222")
+    record.add_email("alice@example.com")
+    record.add_birthday("01.02.1990")
+    book.add_record(record)
+    book.add_record(bot.Record(bot.Name("bob")))
+    book.save_address_book(filename)
+    loaded = bot.AddressBook()
+    loaded.load_address_book(filename)
+    assert list(loaded.data) == ["alice", "bob"]
+    assert loaded.show_record("alice") == book.show_record("alice")
+    assert loaded.data["bob"].birthday is None
+
+    notes = bot.Notebook()
+    notes.add_record(bot.RecordNote(bot.Hashtag("work"), "ünïcode note"))
+    notes.save_notes(tmp_path / "note_book.bin")
+    loaded = bot.Notebook()
+    loaded.load_notes(tmp_path / "note_book.bin")
+    assert loaded.data["#work"].show() == ["ünïcode note"]
+
+
+def test_pickled_files_load_only_after_migrate(tmp_path):
+    filename = tmp_path / "address_book.bin"
+    filename.write_bytes(pickle.dumps({"alice": bot.Record(bot.Name("alice"), phone="0501111111")}))
+    book = bot.AddressBook()
+    with pytest.raises(codec.CodecError):
+        book.load_address_book(filename)
+    assert bot.migrate_file(filename, codec.BOOK)
+    assert not bot.migrate_file(filename, codec.BOOK)
+    book.load_address_book(filename)
+    assert book.data["alice"].phones[0].value == "0501111111"
+
+
+def test_rejects_other_kinds_and_versions():
+    data = codec.encode(codec.NOTES, [])
+    with pytest.raises(codec.CodecError):
+        codec.decode(data, bot, codec.BOOK)
+    with pytest.raises(codec.CodecError):
+        codec.decode(data[:4] + b"\x09" + data[5:], bot, codec.NOTES)
+
+
+def test_streaming_decoder_reads_in_chunks(monkeypatch, name_for):
+    records = make_book(name_for, 300)
+    monkeypatch.setattr(codec, "CHUNK", 64)
+    file = io.BytesIO(codec.encode(codec.BOOK, records))
+    decoded = list(codec.iter_file(file, bot, codec.BOOK))
+    assert [name for name, _ in decoded] == [record.get_name() for record in records]
+    assert str(decoded[-1][1]) == str(records[-1])
+
+
+def test_read_range_crosses_blocks(tmp_path, monkeypatch, name_for):
+    monkeypatch.setattr(codec, "BLOCK", 16)
+    records = make_book(name_for, 100)
+    filename = tmp_path / "address_book.bin"
+    filename.write_bytes(codec.encode(codec.BOOK, records))
+    for start, stop in ((0, 5), (14, 40), (90, 200), (50, 50)):
+        decoded = codec.read_range(filename, bot, codec.BOOK, start, stop)
+        assert [str(record) for _, record in decoded] == [str(record) for record in records[start:stop]]
@@ -0,0 +1,7 @@
+import pytest
+
+
+@pytest.fixture
+def name_for():
+    # Names may only contain letters, so the digits are spelled as a-j.
+    return lambda number: "user" + "".join(chr(ord("a") + int(digit)) for digit in str(number))
@@ -0,0 +1,45 @@
+import pytest
+
+import pymakers.dirs as dirs
+
+
+@pytest.mark.skipif(not dirs.HAS_DIR_FD, reason="no dir_fd support")
+def test_dir_cache_follows_renamed_folders(tmp_path):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "a.txt").write_text("a")
+    cache = dirs.DirCache()
+    cache.make(tmp_path / "target" / "docs")
+    cache.fd(source)
+    source.rename(tmp_path / "moved")
+    cache.rename(source / "a.txt", tmp_path / "target" / "docs" / "a.txt")
+    cache.close()
+    assert (tmp_path / "target" / "docs" / "a.txt").read_text() == "a"
+    assert not list((tmp_path / "moved").iterdir())
+
+
+def test_dir_cache_limits_open_descriptors(tmp_path):
+    cache = dirs.DirCache(max_open=2)
+    for name in "abcd":
+        cache.make(tmp_path / name)
+    assert len(cache.fds) <= 2
+    cache.rmdir(tmp_path / "d")
+    cache.close()
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a", "b", "c"]
+
+
+def test_dir_cache_writes_and_reports_made_folders(tmp_path):
+    (tmp_path / "a").mkdir()
+    cache = dirs.DirCache()
+    created = []
+    cache.make(tmp_path / "a" / "b" / "c", created)
+    assert created == [tmp_path / "a" / "b", tmp_path / "a" / "b" / "c"]
+    target = tmp_path / "a" / "b" / "c" / "file.bin"
+    with open(cache.create(target), "wb") as file:
+        file.write(b"data")
+    assert target.read_bytes() == b"data"
+    cache.unlink(target)
+    for folder in reversed(created):
+        cache.rmdir(folder)
+    cache.close()
+    assert list(tmp_path.iterdir()) == [tmp_path / "a"] and not list((tmp_path / "a").iterdir())
@@ -0,0 +1,49 @@
+import pymakers.file_parser as parser
+
+
+def make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"data")
+
+
+def summary(files):
+    return (
+        {category: sorted(container) for category, container in files["files"].items()},
+        sorted(files["other_files"]),
+        files["unknown_extensions"],
+        sorted(files["folders"]),
+    )
+
+
+def test_scan_parallel_matches_scan(tmp_path):
+    make_tree(tmp_path, [
+        "a/photo.jpg", "a/b/c/song.mp3", "a/b/notes.txt", "d/clip.mkv", "d/data.xyz",
+        "readme", "images/skipped.jpg", "e/archives/skipped.zip",
+    ])
+    expected = summary(parser.scan(tmp_path, sniff=False))
+    assert summary(parser.scan_parallel(tmp_path, workers=3, sniff=False)) == expected
+    assert summary(parser.scan_parallel(tmp_path, workers=2, processes=True, sniff=False)) == expected
+
+
+def test_scan_parallel_lists_parents_first(tmp_path):
+    make_tree(tmp_path, ["a/b/c/d/file.txt", "x/y/file.txt"])
+    folders = parser.scan_parallel(tmp_path, workers=4, sniff=False)["folders"]
+    for folder in folders:
+        if folder.parent != tmp_path:
+            assert folders.index(folder.parent) < folders.index(folder)
+
+
+def test_scan_parallel_sniffs_with_the_given_rules(tmp_path):
+    import json
+
+    from pymakers.rules import load_rules
+
+    (tmp_path / "rules.json").write_text(json.dumps({"rules": [{"target": "pictures", "extensions": ["png"]}]}))
+    ruleset = load_rules(tmp_path / "rules.json")
+    (tmp_path / "a").mkdir()
+    (tmp_path / "a" / "mystery").write_bytes(b"\x89PNG\r\n\x1a\n" + bytes(32))
+    for processes in (False, True):
+        files = parser.scan_parallel(tmp_path, workers=2, processes=processes, rules=ruleset)
+        assert files["files"].get("pictures") == [tmp_path / "a" / "mystery"]
@@ -0,0 +1,43 @@
+import random
+
+import pymakers.hamt as hamt
+
+
+class Colliding:
+    def __init__(self, name):
+        self.name = name
+
+    def __hash__(self):
+        return 42
+
+    def __eq__(self, other):
+        return isinstance(other, Colliding) and other.name == self.name
+
+
+def test_persistent_dict_matches_dict():
+    rng = random.Random(7)
+    expected = {}
+    actual = hamt.PersistentDict()
+    for step in range(5000):
+        key = rng.choice([rng.randrange(3000), f"name{rng.randrange(500)}", Colliding(rng.randrange(5))])
+        if key in expected and rng.random() < 0.4:
+            del expected[key]
+            del actual[key]
+        else:
+            expected[key] = actual[key] = step
+    assert len(actual) == len(expected)
+    assert list(actual.items()) == list(expected.items())
+    assert all(actual[key] == value for key, value in expected.items())
+
+
+def test_snapshot_is_unchanged_by_later_writes():
+    book = hamt.PersistentDict({f"user{index}": index for index in range(1000)})
+    snapshot = book.snapshot()
+    iterator = iter(snapshot)
+    first = next(iterator)
+    for index in range(0, 1000, 2):
+        del book[f"user{index}"]
+    book["new"] = -1
+    assert [first, *iterator] == [f"user{index}" for index in range(1000)]
+    assert len(snapshot) == 1000 and "new" not in snapshot
+    assert len(book) == 501 and list(book)[-1] == "new"
@@ -0,0 +1,89 @@
+import random
+
+import bot
+import lazy
+
+
+def make_record(name_for, number: int) -> bot.Record:
+    return bot.Record(bot.Name(name_for(number)), phone=f"0{number:09d}")
+
+
+def saved_book(tmp_path, name_for, count: int) -> bot.AddressBook:
+    book = bot.AddressBook()
+    for number in range(count):
+        book.add_record(make_record(name_for, number))
+    book.save_address_book(tmp_path / "address_book.bin")
+    loaded = bot.AddressBook()
+    loaded.load_address_book(tmp_path / "address_book.bin")
+    return loaded
+
+
+def test_records_are_hydrated_on_first_use(tmp_path, name_for):
+    book = saved_book(tmp_path, name_for, 50)
+    assert isinstance(book.data, lazy.LazyDict)
+    assert len(book.data) == 50 and not book.data.store.cache
+    record = book.get_records("userbc")
+    assert record.phones[0].value == "0000000012"
+    assert book.get_records("userbc") is record
+    assert len(book.data.store.cache) == 1
+    assert book.get_records("nobody") is None and "nobody" not in book.data
+
+
+def test_cache_is_bounded(tmp_path, name_for):
+    book = saved_book(tmp_path, name_for, 50)
+    book.data.store.cache_size = 8
+    assert [record.get_name() for record in book] == list(book.data)
+    assert len(book.data.store.cache) == 8
+
+
+def test_matches_dict_semantics(tmp_path, name_for):
+    book = saved_book(tmp_path, name_for, 40)
+    model = {name: str(record) for name, record in book.data.items()}
+    snapshot = book.snapshot()
+    frozen = list(snapshot.data)
+    pick = random.Random(7)
+    for step in range(300):
+        number = pick.randrange(60)
+        name = name_for(number)
+        if pick.random() < 0.4 and name in model:
+            del book.data[name]
+            del model[name]
+        else:
+            record = make_record(name_for, number)
+            record.add_email(f"u{step}@example.com")
+            book.add_record(record)
+            model[name] = str(record)
+    assert list(book.data) == list(model)
+    assert {name: str(record) for name, record in book.data.items()} == model
+    assert len(book.data) == len(model)
+    assert list(snapshot.data) == frozen
+
+    book.save_address_book(tmp_path / "changed.bin")
+    loaded = bot.AddressBook()
+    loaded.load_address_book(tmp_path / "changed.bin")
+    assert {name: str(record) for name, record in loaded.data.items()} == model
+    assert list(loaded.data) == list(model)
+
+
+def test_save_mapped_reads_blobs_without_decoding(tmp_path, monkeypatch, name_for):
+    import codec
+    import mapped
+
+    book = saved_book(tmp_path, name_for, 30)
+    changed = make_record(name_for, 5)
+    changed.add_email("five@example.com")
+    changed.add_birthday("01.02.1990")
+    book.add_record(changed)
+    book.add_record(make_record(name_for, 99))
+    del book.data[name_for(7)]
+    expected = [book.show_record(name) for name in book.data]
+    book.data.store.cache.clear()
+    decodes = []
+    original = codec.decode_records
+    monkeypatch.setattr(codec, "decode_records", lambda *args: decodes.append(1) or original(*args))
+    book.save_mapped(tmp_path / "address_book.map")
+    assert decodes == [] and not book.data.store.cache
+    monkeypatch.undo()
+    with mapped.MappedBook(tmp_path / "address_book.map") as view:
+        assert list(view) == list(book.data)
+        assert [view.show_record(name) for name in view] == expected
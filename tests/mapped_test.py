@@ -0,0 +1,67 @@
+import multiprocessing
+
+import pytest
+
+import bot
+import mapped
+
+NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy"]
+
+
+def make_book() -> bot.AddressBook:
+    book = bot.AddressBook()
+    for index, name in enumerate(NAMES):
+        record = bot.Record(bot.Name(name), phone=f"050{index:07d}")
+        if index % 2 == 0:
+            record.add_phone(f"067{index:07d}")
+            record.add_email(f"{name}@example.com")
+        if index % 3 == 0:
+            record.add_birthday("01.01.1990")
+        book.add_record(record)
+    return book
+
+
+def count_in_child(filename, results) -> None:
+    with mapped.MappedBook(filename) as book:
+        results.put((len(book), book.phones("judy")))
+
+
+def test_mapped_book_answers_like_the_address_book(tmp_path):
+    book = make_book()
+    filename = tmp_path / "address_book.map"
+    book.save_mapped(filename)
+    with mapped.MappedBook(filename) as view:
+        assert len(view) == len(NAMES)
+        assert list(view) == NAMES
+        assert "erin" in view and "nobody" not in view
+        assert view.phones("alice") == ["0500000000", "0670000000"]
+        assert view.emails("bob") == []
+        assert view.emails("carol") == ["carol@example.com"]
+        assert view.birthday("dave") == book.data["dave"].birthday.value
+        assert view.birthday("bob") is None and view.phones("nobody") is None
+        assert [view.show_record(name) for name in NAMES] == [book.show_record(name) for name in NAMES]
+        assert view.search("067") == [book.show_record(name) for name in NAMES[::2]]
+        assert view.search("ALICE", "i") == [book.show_record("alice")]
+        assert len(view.birthdays(366)) == 4
+
+
+def test_mapped_book_is_shared_between_processes(tmp_path):
+    filename = tmp_path / "address_book.map"
+    make_book().save_mapped(filename)
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=count_in_child, args=(str(filename), results)) for _ in range(2)]
+    for worker in workers:
+        worker.start()
+    assert [results.get(timeout=10) for _ in workers] == [(len(NAMES), ["0500000009"])] * 2
+    for worker in workers:
+        worker.join()
+
+
+def test_empty_and_foreign_files(tmp_path):
+    filename = tmp_path / "address_book.map"
+    bot.AddressBook().save_mapped(filename)
+    with mapped.MappedBook(filename) as view:
+        assert len(view) == 0 and "alice" not in view and view.search("a") == []
+    bot.AddressBook().save_address_book(filename)
+    with pytest.raises(mapped.MappedError):
+        mapped.MappedBook(filename)
@@ -0,0 +1,67 @@
+import json
+import os
+import time
+
+import pytest
+
+import pymakers.rules as rules
+
+
+class Entry:
+    def __init__(self, name, size=0, age_days=0):
+        self.name = name
+        self.size = size
+        self.mtime = time.time() - age_days * 86400
+
+    def stat(self):
+        return os.stat_result((0, 0, 0, 0, 0, 0, self.size, 0, int(self.mtime), 0))
+
+
+def test_default_rules_follow_categories():
+    assert rules.DEFAULT_RULES.classify(Entry("photo.JPG")) == "images"
+    assert rules.DEFAULT_RULES.classify(Entry("backup.tgz")) == "archives"
+    assert rules.DEFAULT_RULES.classify(Entry("readme")) == "other"
+
+
+def test_rule_stages_and_predicates(tmp_path):
+    config = {
+        "skip_folders": ["keep"],
+        "rules": [
+            {"target": "big_video", "extensions": ["mp4"], "min_size": 1000},
+            {"target": "video", "extensions": ["mp4", "mkv"]},
+            {"target": "screenshots", "glob": "Screenshot*"},
+            {"target": "logs", "regex": r".*\.log\.\d+"},
+            {"target": "stale", "older_than_days": 365},
+        ],
+    }
+    (tmp_path / "rules.json").write_text(json.dumps(config))
+    ruleset = rules.load_rules(tmp_path / "rules.json")
+    assert ruleset.classify(Entry("clip.mp4", size=5000)) == "big_video"
+    assert ruleset.classify(Entry("clip.mp4", size=10)) == "video"
+    assert ruleset.classify(Entry("Screenshot 2024.png")) == "screenshots"
+    assert ruleset.classify(Entry("app.log.3")) == "logs"
+    assert ruleset.classify(Entry("notes.txt", age_days=400)) == "stale"
+    assert ruleset.classify(Entry("notes.txt", age_days=1)) == "other"
+    assert ruleset.skip_folders == {"keep", "big_video", "video", "screenshots", "logs", "stale"}
+
+
+def test_patterns_that_can_not_be_combined():
+    ruleset = rules.RuleSet([
+        rules.Rule("logs", glob="*.log"),
+        rules.Rule("photos", regex=r"(?i).*\.jpe?g"),
+        rules.Rule("doubles", regex=r"(x)\1.*"),
+    ])
+    assert ruleset.pattern is None
+    assert ruleset.classify(Entry("IMG_1.JPEG")) == "photos"
+    assert ruleset.classify(Entry("xxdata")) == "doubles"
+    assert ruleset.classify(Entry("xydata")) == "other"
+    assert ruleset.classify(Entry("app.log")) == "logs"
+    assert rules.RuleSet([rules.Rule("logs", glob="*.log")]).pattern is not None
+    with pytest.raises(ValueError):
+        rules.Rule("broken", regex="(")
+
+
+def test_unknown_rule_option(tmp_path):
+    (tmp_path / "rules.json").write_text(json.dumps({"rules": [{"target": "x", "suffix": "y"}]}))
+    with pytest.raises(ValueError):
+        rules.load_rules(tmp_path / "rules.json")
@@ -0,0 +1,113 @@
+import asyncio
+import json
+
+import pytest
+
+import bot
+import server
+
+
+def parse_responses(data):
+    responses = []
+    while data:
+        head, _, rest = data.partition(b"\r\n\r\n")
+        lines = head.decode().split("\r\n")
+        length = int(next(line for line in lines if line.startswith("Content-Length")).split(":")[1])
+        responses.append((int(lines[0].split(" ")[1]), json.loads(rest[:length])))
+        data = rest[length:]
+    return responses
+
+
+def request(method, path, args=None, close=False):
+    body = json.dumps({"args": args}).encode() if args is not None else b""
+    connection = "Connection: close\r\n" if close else ""
+    return f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n{connection}\r\n".encode() + body
+
+
+@pytest.fixture
+def books(monkeypatch):
+    monkeypatch.setattr(bot, "phonebook", bot.AddressBook())
+    monkeypatch.setattr(bot, "notebook", bot.Notebook())
+
+
+def test_server_answers_pipelined_requests_in_order(books):
+    async def run():
+        api = server.ApiServer(save=False)
+        await api.start("127.0.0.1", 0)
+        reader, writer = await asyncio.open_connection("127.0.0.1", api.port)
+        writer.write(
+            request("POST", "/commands/add", ["Alice", "0123456789"])
+            + request("GET", "/commands/phone?arg=Alice")
+            + request("POST", "/commands/note", ["buy milk #shop"])
+            + request("GET", "/commands/show%20all")
+            + request("POST", "/commands/exit", [])
+            + request("GET", "/commands/hashtag?arg=shop", close=True)
+        )
+        data = await reader.read()
+        writer.close()
+        await api.close()
+        return parse_responses(data)
+
+    responses = asyncio.run(run())
+    assert [status for status, _ in responses] == [200, 200, 200, 200, 404, 200]
+    assert responses[0][1]["result"] == "Contact successfully added"
+    assert "0123456789" in responses[1][1]["result"]
+    assert responses[3][1]["result"].startswith("Alice:")
+    assert "buy milk" in responses[5][1]["result"]
+
+
+def test_daemon_runs_one_shot_commands(books, tmp_path):
+    import client
+    path = str(tmp_path / "pymakers.sock")
+
+    async def run():
+        api = server.ApiServer(save=False)
+        await api.start_unix(path)
+        loop = asyncio.get_running_loop()
+        results = []
+        for words in (["add", "Bob", "0987654321"], ["phone", "Bob"], ["show", "all"], ["nope"]):
+            results.append(await loop.run_in_executor(None, client.send_command, words, path))
+        await api.close()
+        return results
+
+    added, phone, show_all, unknown = asyncio.run(run())
+    assert added == "Contact successfully added"
+    assert "0987654321" in phone
+    assert show_all.startswith("Bob:")
+    # Commands the daemon does not serve are left to the caller.
+    assert unknown is None
+    assert client.send_command(["phone", "Bob"], str(tmp_path / "missing.sock")) is None
+
+
+def test_one_shot_commands_save_only_after_writes(books, monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    saves = []
+    monkeypatch.setattr(bot, "save_books", lambda: saves.append(len(bot.phonebook)))
+    assert bot.run_once(["show", "all"]) == "The phonebook is empty"
+    assert saves == []
+    assert bot.run_once(["add", "Alice", "0123456789"]) == "Contact successfully added"
+    assert saves == [1]
+
+
+def test_writes_go_on_after_a_failed_save(books, monkeypatch):
+    saves = []
+
+    def save_books():
+        saves.append(len(bot.phonebook))
+        if len(saves) == 1:
+            raise OSError("disk full")
+
+    monkeypatch.setattr(bot, "save_books", save_books)
+
+    async def run():
+        api = server.ApiServer()
+        await api.start("127.0.0.1", 0)
+        results = []
+        for name in ("Alice", "Bob"):
+            results.append(await api.run_command("add", [name, "0123456789"]))
+            await asyncio.sleep(0.05)
+        await api.close()
+        return results
+
+    assert asyncio.run(run()) == ["Contact successfully added"] * 2
+    assert saves == [1, 2]
@@ -0,0 +1,55 @@
+import pytest
+
+import bot
+import shards
+
+NAMES = ["alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi", "ivan", "judy"]
+
+
+def make_records():
+    for index, name in enumerate(NAMES):
+        yield bot.Record(bot.Name(name), phone=bot.Phone(f"050{index:07d}"), birthday=bot.Birthday("01.01.1990"))
+
+
+def test_sharded_book_matches_single_book(tmp_path):
+    single = bot.AddressBook()
+    with shards.ShardedAddressBook(3, str(tmp_path / "book.bin")) as book:
+        for record in make_records():
+            single.add_record(record)
+            book.add_record(record)
+        assert len(book) == len(NAMES)
+        assert book.get_records("erin").phones[0].value == "0500000004"
+        assert book.get_records("nobody") is None
+        assert book.search("050000") == [single.show_record(name) for name in NAMES]
+        assert book.search("ALICE", "i") == [single.show_record("alice")]
+        lines, total = book.page(2, 4)
+        assert lines == [str(record) for record in list(single)[4:8]] and total == 3
+        assert len(book.birthdays(366)) == len(NAMES)
+        assert book.delete_record("bob") and not book.delete_record("bob")
+    assert len(list(tmp_path.glob("book.shard*.bin"))) == 3
+    with shards.ShardedAddressBook(3, str(tmp_path / "book.bin")) as book:
+        book.add_record(bot.Record(bot.Name("zed"), phone="0509999999"))
+        lines, _ = book.page(1, 20)
+        assert lines == [str(record) for record in list(single) if record.get_name() != "bob"] + [
+            str(book.get_records("zed"))
+        ]
+
+
+def test_shard_files_are_codec_books(tmp_path):
+    import codec
+
+    shard = shards.Shard(str(tmp_path / "book.shard0.bin"))
+    for order, record in enumerate(make_records()):
+        shard.add(order * 3, record)
+    shard.save()
+    data = (tmp_path / "book.shard0.bin").read_bytes()
+    assert data[:4] == codec.MAGIC
+    book = bot.AddressBook()
+    book.load_address_book(tmp_path / "book.shard0.bin")
+    assert list(book.data) == NAMES
+    loaded = shards.Shard(str(tmp_path / "book.shard0.bin"))
+    assert loaded.orders == {name: index * 3 for index, name in enumerate(NAMES)}
+    assert loaded.get("erin").phones[0].value == "0500000004"
+    bot.AddressBook().save_address_book(tmp_path / "plain.bin")
+    with pytest.raises(codec.CodecError):
+        shards.Shard(str(tmp_path / "plain.bin"))
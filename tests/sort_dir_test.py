@@ -1 +1,373 @@
+import pytest
+
 import pymakers.sort_dir as sort
+
+
+def make_tree(root, names):
+    for name in names:
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"data " + name.encode())
+
+
+def test_sort_dir_moves_by_category(tmp_path):
+    make_tree(tmp_path, ["a/photo.jpg", "a/b/song.mp3", "notes.txt", "readme"])
+    report = sort.sort_dir(tmp_path)
+    assert report.files == {"images": 1, "audio": 1, "documents": 1, "other": 1}
+    assert report.bytes["images"] == len(b"data a/photo.jpg")
+    assert (tmp_path / "images" / "photo.jpg").exists()
+    assert (tmp_path / "audio" / "song.mp3").exists()
+    assert (tmp_path / "documents" / "notes.txt").exists()
+    assert (tmp_path / "readme").exists()
+    assert not (tmp_path / "a").exists()
+
+
+def test_incremental_sort_processes_only_new_files(tmp_path, monkeypatch):
+    make_tree(tmp_path, ["keep/readme", "keep/deep/other.bin", "new/photo.jpg"])
+    sort.sort_dir(tmp_path, incremental=True)
+    assert (tmp_path / sort.MANIFEST_NAME).exists()
+    assert not (tmp_path / "new").exists()
+
+    make_tree(tmp_path, ["keep/deep/video.mp4"])
+    handled = []
+    original = sort.handle_other
+    monkeypatch.setattr(sort, "handle_other", lambda f, *args: handled.append(f) or original(f, *args))
+    sort.sort_dir(tmp_path, incremental=True)
+    assert (tmp_path / "video" / "video.mp4").exists()
+    assert handled == []
+    assert (tmp_path / "keep" / "deep" / "other.bin").exists()
+
+
+def test_incremental_sort_sees_files_created_during_a_run(tmp_path, monkeypatch):
+    make_tree(tmp_path, ["keep/readme", "b/song.mp3"])
+    original = sort.handle_folder
+    created = []
+
+    # Empty folders are removed after the whole tree has been listed.
+    def create_late(folder, *args):
+        if not created:
+            created.append(tmp_path / "keep" / "late.jpg")
+            make_tree(tmp_path, ["keep/late.jpg"])
+        return original(folder, *args)
+
+    monkeypatch.setattr(sort, "handle_folder", create_late)
+    sort.sort_dir(tmp_path, incremental=True)
+    monkeypatch.undo()
+    for _ in range(3):
+        sort.sort_dir(tmp_path, incremental=True)
+    assert (tmp_path / "images" / "late.jpg").exists()
+    assert not (tmp_path / "keep" / "late.jpg").exists()
+
+
+def test_manifest_is_json_and_pruned(tmp_path):
+    import json
+    import pickle
+
+    (tmp_path / sort.MANIFEST_NAME).write_bytes(pickle.dumps({"version": 2, "folders": {}, "files": {}}))
+    make_tree(tmp_path, ["photo.jpg", "notes.txt"])
+    sort.sort_dir(tmp_path, incremental=True)
+    manifest = json.loads((tmp_path / sort.MANIFEST_NAME).read_text())
+    assert sorted(manifest["files"]) == [str(tmp_path / "documents" / "notes.txt"), str(tmp_path / "images" / "photo.jpg")]
+    (tmp_path / "images" / "photo.jpg").unlink()
+    sort.sort_dir(tmp_path, incremental=True)
+    manifest = json.loads((tmp_path / sort.MANIFEST_NAME).read_text())
+    assert list(manifest["files"]) == [str(tmp_path / "documents" / "notes.txt")]
+
+
+def test_watch_dir_sorts_new_files(tmp_path):
+    import threading
+    import time
+    from pymakers.watch import watch_dir
+
+    stop = threading.Event()
+    watcher = threading.Thread(
+        target=watch_dir, args=(tmp_path,), kwargs={"min_interval": 0.01, "settle": 0.05, "stop": stop}
+    )
+    watcher.start()
+    try:
+        make_tree(tmp_path, ["incoming/photo.png", "song.mp3"])
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not (tmp_path / "audio" / "song.mp3").exists():
+            time.sleep(0.01)
+        while time.monotonic() < deadline and not (tmp_path / "images" / "photo.png").exists():
+            time.sleep(0.01)
+    finally:
+        stop.set()
+        watcher.join()
+    assert (tmp_path / "images" / "photo.png").exists()
+    assert (tmp_path / "audio" / "song.mp3").exists()
+
+
+def test_watch_dir_sorts_settled_files_during_a_trickle(tmp_path):
+    import threading
+    import time
+    from pymakers.watch import watch_dir
+
+    make_tree(tmp_path, ["song.mp3"])
+    stop = threading.Event()
+    watcher = threading.Thread(
+        target=watch_dir,
+        args=(tmp_path,),
+        kwargs={"min_interval": 0.01, "settle": 0.05, "max_wait": 0.2, "stop": stop},
+    )
+    watcher.start()
+    try:
+        deadline = time.monotonic() + 5
+        number = 0
+        while time.monotonic() < deadline and not (tmp_path / "audio" / "song.mp3").exists():
+            # A new file lands on almost every poll.
+            (tmp_path / "incoming").mkdir(exist_ok=True)
+            (tmp_path / "incoming" / f"part{number}.tmp").write_text("x")
+            number += 1
+            time.sleep(0.005)
+    finally:
+        stop.set()
+        watcher.join()
+    assert (tmp_path / "audio" / "song.mp3").exists()
+
+
+def test_sort_dir_sniffs_files_without_extension(tmp_path):
+    import zipfile
+
+    (tmp_path / "scan").write_bytes(b"\xff\xd8\xff\xe0" + bytes(60))
+    (tmp_path / "report.bin").write_bytes(b"%PDF-1.7\n")
+    with zipfile.ZipFile(tmp_path / "bundle", "w") as archive:
+        archive.writestr("inside.txt", "hello")
+    (tmp_path / "plain").write_bytes(b"just text")
+    sort.sort_dir(tmp_path)
+    assert (tmp_path / "images" / "scan").exists()
+    assert (tmp_path / "documents" / "report.bin").exists()
+    assert (tmp_path / "archives" / "bundle" / "inside.txt").read_text() == "hello"
+    assert (tmp_path / "plain").exists()
+
+
+def test_stream_archives_extracts_into_categories(tmp_path):
+    import io
+    import tarfile
+
+    with tarfile.open(tmp_path / "holiday.tar.gz", "w:gz") as archive:
+        for name, data in [("pics/beach.jpg", b"jpg"), ("list.txt", b"txt"), ("misc/data.bin", b"bin")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    sort.sort_dir(tmp_path, stream_archives=True)
+    assert (tmp_path / "images" / "beach.jpg").read_bytes() == b"jpg"
+    assert (tmp_path / "documents" / "list.txt").read_bytes() == b"txt"
+    assert (tmp_path / "archives" / "holiday" / "misc" / "data.bin").read_bytes() == b"bin"
+    assert not (tmp_path / "holiday.tar.gz").exists()
+
+
+def test_archive_stem_strips_double_suffix():
+    from pymakers.unpack import archive_stem
+
+    assert archive_stem("backup.tar.gz") == "backup"
+    assert archive_stem("backup.TGZ") == "backup"
+    assert archive_stem("photos.zip") == "photos"
+
+
+def test_sort_dir_copies_across_devices(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    target = tmp_path / "target"
+    target.mkdir()
+    make_tree(source, ["a/photo.jpg", "clip.mp4"])
+    monkeypatch.setattr(sort.Mover, "device", lambda self, folder: 1 if source in folder.parents or folder == source else 2)
+    report = sort.sort_dir(source, target=target)
+    assert (report.moves.renamed, report.moves.copied) == (0, 2)
+    assert "2 files copied" in str(report)
+    assert (target / "images" / "photo.jpg").read_bytes() == b"data a/photo.jpg"
+    assert (target / "video" / "clip.mp4").read_bytes() == b"data clip.mp4"
+    assert not (source / "clip.mp4").exists()
+    assert not list(target.rglob(".*.part"))
+
+
+def test_broken_archive_leaves_nothing_behind(tmp_path):
+    import zipfile
+
+    from pymakers.unpack import extract_sorted, member_target
+
+    with zipfile.ZipFile(tmp_path / "pack.zip", "w", zipfile.ZIP_STORED) as archive:
+        archive.writestr("a.txt", b"first member")
+        archive.writestr("b.jpg", b"second member")
+    data = (tmp_path / "pack.zip").read_bytes()
+    (tmp_path / "pack.zip").write_bytes(data.replace(b"second member", b"SECOND MEMBER"))
+    assert extract_sorted(tmp_path / "pack.zip", tmp_path) is None
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["pack.zip"]
+    assert member_target("../..//", tmp_path, tmp_path / "archives" / "pack") is None
+
+
+@pytest.mark.parametrize("stream_archives", [True, False])
+def test_corrupt_deflate_member_fails_only_its_archive(tmp_path, stream_archives):
+    import os
+    import zipfile
+
+    make_tree(tmp_path, ["photo.jpg"])
+    with zipfile.ZipFile(tmp_path / "pack.zip", "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("a.txt", os.urandom(2000).hex() * 5)
+    data = bytearray((tmp_path / "pack.zip").read_bytes())
+    for index in range(60, 200):
+        data[index] ^= 0x55
+    (tmp_path / "pack.zip").write_bytes(data)
+    for _ in range(2):
+        report = sort.sort_dir(tmp_path, stream_archives=stream_archives)
+        assert report.archives_failed == 1
+    assert (tmp_path / "images" / "photo.jpg").exists()
+    assert not (tmp_path / "documents").exists()
+    assert not (tmp_path / "archives" / "pack").exists()
+    assert not (tmp_path / sort.JOURNAL_NAME).exists()
+
+
+def test_sort_dir_recovers_interrupted_run(tmp_path):
+    import json
+
+    make_tree(tmp_path, ["big.mp4", "docs.zip", "documents/partial.txt"])
+    (tmp_path / "video").mkdir()
+    (tmp_path / "video" / "big.mp4").write_bytes(b"data big.mp4")
+    (tmp_path / "video" / ".big.mp4.part").write_bytes(b"da")
+    records = [
+        ["move", "begin", str(tmp_path / "big.mp4"), str(tmp_path / "video" / "big.mp4")],
+        ["extract", "begin", str(tmp_path / "docs.zip"), str(tmp_path / "archives" / "docs")],
+        ["write", "begin", str(tmp_path / "docs.zip"), str(tmp_path / "documents" / "partial.txt")],
+    ]
+    (tmp_path / sort.JOURNAL_NAME).write_text("".join(json.dumps(record) + "\n" for record in records))
+    sort.sort_dir(tmp_path)
+    assert not (tmp_path / "big.mp4").exists()
+    assert not (tmp_path / "video" / ".big.mp4.part").exists()
+    assert (tmp_path / "video" / "big.mp4").read_bytes() == b"data big.mp4"
+    assert not (tmp_path / "documents" / "partial.txt").exists()
+    assert not (tmp_path / sort.JOURNAL_NAME).exists()
+
+
+def test_recover_leaves_finished_renames_alone(tmp_path):
+    import json
+
+    from pymakers.journal import recover
+
+    (tmp_path / "audio").mkdir()
+    (tmp_path / "audio" / "song.mp3").write_bytes(b"same size")
+    (tmp_path / "song.mp3").write_bytes(b"new song!")
+    record = ["move", "done", str(tmp_path / "song.mp3"), str(tmp_path / "audio" / "song.mp3")]
+    (tmp_path / sort.JOURNAL_NAME).write_text(json.dumps(record) + "\n")
+    recover(tmp_path / sort.JOURNAL_NAME)
+    assert (tmp_path / "song.mp3").exists()
+
+
+def test_renames_are_not_journaled(tmp_path, monkeypatch):
+    written = []
+    original = sort.Journal.write
+    monkeypatch.setattr(sort.Journal, "write", lambda self, *args, **kwargs: written.append(args) or original(self, *args, **kwargs))
+    make_tree(tmp_path, ["a/photo.jpg", "song.mp3"])
+    report = sort.sort_dir(tmp_path)
+    assert report.moves.renamed == 2
+    assert written == []
+
+
+def test_sort_dir_reports_progress_and_duplicates(tmp_path):
+    make_tree(tmp_path, ["a/song.mp3", "b/song.mp3", "broken.zip", "data.xyz"])
+    (tmp_path / "b" / "song.mp3").write_bytes((tmp_path / "a" / "song.mp3").read_bytes())
+    events = []
+    report = sort.sort_dir(tmp_path, progress=events.append)
+    assert report.duplicates == 1
+    assert report.archives_failed == 1
+    assert report.total_files == 3
+    assert str(report).startswith("OK: sorted 3 files")
+    assert report.unknown_extensions == {"xyz"}
+    assert events[-1]["files"] == events[-1]["discovered"] == 4
+    assert {"files_per_second", "mb_per_second", "eta"} <= set(events[-1])
+
+
+def test_sort_dir_keeps_colliding_names(tmp_path):
+    make_tree(tmp_path, ["a/Фото.jpg", "b/Foto.jpg", "images/Foto.jpg", "Звіт", "Zvit"])
+    report = sort.sort_dir(tmp_path)
+    assert sorted(path.name for path in (tmp_path / "images").iterdir()) == ["Foto.jpg", "Foto_1.jpg", "Foto_2.jpg"]
+    assert sorted(path.name for path in tmp_path.iterdir() if path.is_file() and not path.name.startswith(".")) == [
+        "Zvit", "Zvit_1"
+    ]
+    assert report.duplicates == 0
+
+
+def test_sort_dir_throttles_operations(tmp_path):
+    from pymakers.throttle import Throttle
+    make_tree(tmp_path, [f"photo{index}.jpg" for index in range(5)])
+    report = sort.sort_dir(tmp_path, throttle=Throttle(ops_per_second=10))
+    assert report.files == {"images": 5}
+    assert report.elapsed >= 0.4
+
+
+def test_limits_set_during_a_run_apply(tmp_path):
+    import time
+    from contextlib import closing
+
+    from pymakers.mover import Mover
+    from pymakers.throttle import Throttle
+
+    make_tree(tmp_path, [f"photo{index}.jpg" for index in range(5)])
+    throttle = Throttle()
+    with closing(Mover(throttle=throttle)) as mover:
+        assert mover.throttle is throttle
+        throttle.set_limits(ops_per_second=10)
+        start = time.monotonic()
+        for index in range(5):
+            sort.handle_media(tmp_path / f"photo{index}.jpg", tmp_path / "images", mover)
+    assert time.monotonic() - start >= 0.35
+
+
+def test_stream_entries_keeps_the_scanner_bounded():
+    import itertools
+    import time
+
+    produced = []
+
+    def entries():
+        for number in itertools.count():
+            produced.append(number)
+            yield number
+
+    stream = sort.stream_entries(entries(), queue_size=2)
+    assert next(stream) == 0
+    time.sleep(0.3)
+    # One taken, two queued and one waiting in put().
+    assert len(produced) <= 4
+    stream.close()
+    stopped_at = len(produced)
+    time.sleep(0.3)
+    assert len(produced) == stopped_at
+
+
+def test_stream_entries_reraises_scanner_errors():
+    import pytest
+
+    def entries():
+        yield 1
+        yield 2
+        raise PermissionError("no access")
+
+    received = []
+    with pytest.raises(PermissionError):
+        for entry in sort.stream_entries(entries(), queue_size=1):
+            received.append(entry)
+    assert received == [1, 2]
+
+
+def test_stream_entries_stops_the_scanner_when_the_consumer_fails():
+    import itertools
+    import time
+    from contextlib import closing
+
+    import pytest
+
+    produced = []
+
+    def entries():
+        for number in itertools.count():
+            produced.append(number)
+            yield number
+
+    with pytest.raises(RuntimeError):
+        with closing(sort.stream_entries(entries(), queue_size=2)) as stream:
+            for _ in stream:
+                raise RuntimeError("move failed")
+    # close() joined the scanner thread, so nothing is produced any more.
+    stopped_at = len(produced)
+    assert stopped_at <= 4
+    time.sleep(0.3)
+    assert len(produced) == stopped_at
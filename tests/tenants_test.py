@@ -0,0 +1,84 @@
+import bot
+import tenants
+
+
+def add_contact(tenant, name, phone):
+    tenant.phonebook.add_record(bot.Record(bot.Name(name), phone=phone))
+
+
+def test_store_manager_evicts_and_flushes_dirty_tenants(tmp_path):
+    manager = tenants.StoreManager(tmp_path, max_tenants=2)
+    with manager.session("red", write=True) as tenant:
+        add_contact(tenant, "alice", "0501111111")
+    with manager.session("blue", write=True) as tenant:
+        add_contact(tenant, "bob", "0502222222")
+    with manager.session("red") as tenant:
+        assert tenant.phonebook.get_records("alice") is not None
+    with manager.session("green"):
+        pass
+    assert list(manager.tenants) == ["red", "green"]
+    assert (tmp_path / "blue" / bot.filename1).exists()
+    with manager.session("blue") as tenant:
+        assert tenant.phonebook.get_records("bob").phones[0].value == "0502222222"
+    metrics = manager.metrics()
+    assert metrics["red"]["hits"] == 1 and metrics["red"]["misses"] == 1
+    assert metrics["blue"] == {"hits": 0, "misses": 2, "evictions": 1, "flushes": 1, "loaded": True}
+    manager.flush()
+    assert (tmp_path / "red" / bot.filename1).exists()
+
+
+def test_store_manager_keeps_tenants_in_use(tmp_path):
+    manager = tenants.StoreManager(tmp_path, max_tenants=1)
+    with manager.session("red", write=True) as red:
+        with manager.session("blue"):
+            assert set(manager.tenants) == {"red", "blue"}
+        add_contact(red, "carol", "0503333333")
+    manager.open("green")
+    assert list(manager.tenants) == ["green"]
+    assert manager.open("red").phonebook.get_records("carol") is not None
+
+
+def test_store_manager_bounds_estimated_memory(tmp_path):
+    manager = tenants.StoreManager(tmp_path, max_bytes=30 * tenants.RECORD_BYTES)
+    with manager.session("red", write=True) as tenant:
+        for number in range(20):
+            add_contact(tenant, "user" + "abcdefghij"[number % 10] * (number + 1), "0501111111")
+    assert manager.tenants["red"].size == 20 * tenants.RECORD_BYTES
+    with manager.session("blue", write=True) as tenant:
+        for number in range(20):
+            add_contact(tenant, "user" + "abcdefghij"[number % 10] * (number + 1), "0502222222")
+    assert list(manager.tenants) == ["blue"]
+    assert manager.metrics()["red"]["flushes"] == 1
+
+
+def test_store_manager_saves_outside_its_lock(tmp_path, monkeypatch):
+    manager = tenants.StoreManager(tmp_path, max_tenants=1)
+    held = []
+    original = tenants.Tenant.save
+    monkeypatch.setattr(tenants.Tenant, "save", lambda self: held.append(manager.lock.locked()) or original(self))
+    with manager.session("red", write=True) as tenant:
+        add_contact(tenant, "alice", "0501111111")
+    manager.open("blue")
+    manager.flush()
+    assert held == [False]
+    assert manager.open("red").phonebook.get_records("alice") is not None
+
+
+def test_writers_of_one_tenant_take_turns(tmp_path):
+    import threading
+    import time
+
+    manager = tenants.StoreManager(tmp_path)
+    order = []
+
+    def second_writer():
+        with manager.session("red", write=True):
+            order.append("second")
+
+    with manager.session("red", write=True):
+        writer = threading.Thread(target=second_writer)
+        writer.start()
+        time.sleep(0.1)
+        order.append("first")
+    writer.join()
+    assert order == ["first", "second"]
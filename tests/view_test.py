@@ -0,0 +1,46 @@
+import os
+
+import pymakers.view as view
+
+
+def test_build_view_links_without_moving(tmp_path):
+    source = tmp_path / "backup"
+    (source / "a").mkdir(parents=True)
+    (source / "a" / "Фото.jpg").write_bytes(b"jpg")
+    (source / "a" / "notes.txt").write_bytes(b"txt")
+    (source / "song.mp3").write_bytes(b"mp3")
+    view_root = tmp_path / "view"
+
+    report = view.build_view(source, view_root)
+    assert report.total_files == 3
+    assert (view_root / "images" / "Foto.jpg").read_bytes() == b"jpg"
+    assert os.stat(view_root / "images" / "Foto.jpg").st_ino == os.stat(source / "a" / "Фото.jpg").st_ino
+    assert (source / "a" / "Фото.jpg").exists()
+
+    (source / "song.mp3").unlink()
+    (source / "clip.mp4").write_bytes(b"mp4")
+    report = view.build_view(source, view_root)
+    assert report.total_files == 1
+    assert (view_root / "video" / "clip.mp4").exists()
+    assert not (view_root / "audio" / "song.mp3").exists()
+    assert (view_root / "documents" / "notes.txt").exists()
+
+
+def test_build_view_symbolic_links(tmp_path):
+    source = tmp_path / "backup"
+    source.mkdir()
+    (source / "doc.pdf").write_bytes(b"%PDF-")
+    view.build_view(source, tmp_path / "view", link_type="symbolic")
+    link = tmp_path / "view" / "documents" / "doc.pdf"
+    assert link.is_symlink() and link.resolve() == (source / "doc.pdf").resolve()
+
+
+def test_build_view_scans_folders_named_like_categories(tmp_path):
+    source = tmp_path / "src"
+    for name in ("images/holiday.jpg", "documents/cv.pdf", "top.jpg"):
+        (source / name).parent.mkdir(parents=True, exist_ok=True)
+        (source / name).write_bytes(name.encode())
+    report = view.build_view(source, tmp_path / "view")
+    assert report.total_files == 3
+    assert (tmp_path / "view" / "images" / "holiday.jpg").exists()
+    assert (tmp_path / "view" / "documents" / "cv.pdf").exists()